@@ -1,11 +1,20 @@
+import asyncio
+import base64
+import functools
+import hashlib
 import random
+from dataclasses import dataclass, field
 from typing import Literal
 import httpx
 import yaml
 import re
 import time
 import json
+from typing import Callable, Iterable
+import ijson
 from jsonpath_ng.ext import parse
+from api_tests.common.retry import RetryPolicy, default_retry_policy
+from api_tests.common.shared_cache import SharedCache
 
 
 def load_config(config_path='config.yaml'):
@@ -17,12 +26,131 @@ def load_config(config_path='config.yaml'):
 config = load_config()
 
 
+token_cache = SharedCache('mgmt_tokens')
+
+# Время жизни токена в секундах, если срок действия нельзя получить из самого токена (JWT exp)
+TOKEN_TTL = config.get('mgmt', {}).get('token_ttl', 10 * 60)
+
+
+def get_token_expiration(
+    token: str,
+    default_ttl: float = TOKEN_TTL
+) -> float:
+    """
+    Возвращает время истечения токена: поле exp для JWT (с запасом в 30 секунд), иначе текущее время + default_ttl.
+    """
+    try:
+        payload = token.removeprefix('Bearer ').split('.')[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+        return float(claims['exp']) - 30
+    except (IndexError, KeyError, TypeError, ValueError):
+        return time.time() + default_ttl
+
+
+def get_token_cache_key(
+    server: str,
+    username: str,
+    password: str,
+    login_url: str
+) -> str:
+    """
+    Ключ кэша токенов: сервер, пользователь, хэш пароля и эндпоинт авторизации.
+    Хэш пароля не даёт сессии с неверным паролем получить токен, выданный по верным учётным данным.
+    """
+    password_hash = hashlib.sha256(password.encode()).hexdigest()[:16]
+    return f'{server}|{username}|{password_hash}|{login_url}'
+
+
+class MgmtAuth(httpx.Auth):
+    """
+    Авторизация запросов к МГМТ/slave по токену.\n
+    Если на запрос пришёл ответ 401, токен один раз обновляется (сначала из общего кэша, если другой воркер уже
+    получил новый токен, иначе повторным логином) и запрос повторяется.
+    """
+
+    def __init__(
+        self,
+        login_url: str,
+        username: str,
+        password: str,
+        cache_key: str = None,
+        refresh_on_401: bool = True
+    ):
+        self.login_url = login_url
+        self.username = username
+        self.password = password
+        self.cache_key = cache_key
+        self.refresh_on_401 = refresh_on_401
+        self.token = None
+
+    def set_token(self, token: str):
+        self.token = token
+        if self.cache_key:
+            token_cache.set(self.cache_key, token, get_token_expiration(token))
+
+    def build_login_request(self) -> httpx.Request:
+        return httpx.Request('POST', self.login_url, json={"username": self.username, "password": self.password})
+
+    def refresh_from_cache(self) -> bool:
+        if self.cache_key:
+            token_cache.delete(self.cache_key, self.token)
+            cached_token = token_cache.get(self.cache_key)
+            if cached_token and cached_token != self.token:
+                self.token = cached_token
+                return True
+        return False
+
+    def update_from_login(self, response: httpx.Response):
+        if response.status_code == 200:
+            token = response.json().get("token")
+            if token:
+                self.set_token(token)
+
+    def sync_auth_flow(self, request: httpx.Request):
+        request.headers['Authorization'] = f'{self.token}'
+        response = yield request
+        if response.status_code != 401 or not self.refresh_on_401:
+            return
+
+        if not self.refresh_from_cache():
+            login_response = yield self.build_login_request()
+            login_response.read()
+            self.update_from_login(login_response)
+
+        request.headers['Authorization'] = f'{self.token}'
+        yield request
+
+    async def async_auth_flow(self, request: httpx.Request):
+        request.headers['Authorization'] = f'{self.token}'
+        response = yield request
+        if response.status_code != 401 or not self.refresh_on_401:
+            return
+
+        if not self.refresh_from_cache():
+            login_response = yield self.build_login_request()
+            await login_response.aread()
+            self.update_from_login(login_response)
+
+        request.headers['Authorization'] = f'{self.token}'
+        yield request
+
+
 def get_session(
     server: str = config.get('mgmt', {}).get('server'),
     username: str = config.get('mgmt', {}).get('username', 'admin'),
     password: str = config.get('mgmt', {}).get('password', 'admin'),
-    is_mgmt_server: bool = True
+    is_mgmt_server: bool = True,
+    use_token_cache: bool = True,
+    refresh_on_401: bool = True,
+    retry_policy: RetryPolicy = None
 ) -> httpx.Client:
+    """
+    Возвращает сессию подключения к МГМТ (или slave, если is_mgmt_server == False).\n
+    Если use_token_cache == True, токен берётся из общего для xdist-воркеров кэша (ключ - сервер, пользователь, хэш пароля
+    и эндпоинт авторизации), а логин выполняется только при его отсутствии или истечении. Полученный токен сохраняется в кэш.
+    Если refresh_on_401 == True, при ответе 401 сессия прозрачно переавторизуется один раз и повторяет запрос.
+    Повторные попытки логина выполняются по retry_policy (по умолчанию default_retry_policy с общим выключателем по хосту).
+    """
     if server is None:
         raise ValueError('Server must be defined.')
 
@@ -30,71 +158,181 @@ def get_session(
     login_url = 'management/authenticate' if is_mgmt_server else 'slave/authenticate'
 
     client = httpx.Client(base_url=base_url, verify=False)
+    auth = MgmtAuth(
+        login_url=f'{base_url}{login_url}',
+        username=username,
+        password=password,
+        cache_key=get_token_cache_key(server, username, password, login_url) if use_token_cache else None,
+        refresh_on_401=refresh_on_401
+    )
 
-    start_time = time.time()
-    timeout = 3 * 60
-    retry_delay = 15
+    cached_token = token_cache.get(auth.cache_key) if use_token_cache else None
+    if cached_token:
+        auth.token = cached_token
+        client.auth = auth
+        return client
 
-    while True:
-        try:
+    def login() -> str:
+        response = client.post(login_url, json={"username": username, "password": password})
+        if response.status_code == 401:
+            wait_time = random.uniform(1, 5)
+            time.sleep(wait_time)
             response = client.post(login_url, json={"username": username, "password": password})
+        response.raise_for_status()
+
+        token = response.json().get("token")
+        if not token:
+            raise ValueError("Token not found in the response.")
+        return token
+
+    auth.set_token((retry_policy or default_retry_policy).call(login, host=server))
+    client.auth = auth
+    return client
+
+
+async def get_session_async(
+    server: str = config.get('mgmt', {}).get('server'),
+    username: str = config.get('mgmt', {}).get('username', 'admin'),
+    password: str = config.get('mgmt', {}).get('password', 'admin'),
+    is_mgmt_server: bool = True,
+    use_token_cache: bool = True,
+    refresh_on_401: bool = True,
+    http2: bool = True,
+    max_connections: int = 20,
+    max_keepalive_connections: int = 10,
+    keepalive_expiry: float = 30,
+    retry_policy: RetryPolicy = None
+) -> httpx.AsyncClient:
+    """
+    Асинхронный аналог get_session с той же логикой логина, кэша токенов и повторных попыток (retry_policy).\n
+    Возвращает httpx.AsyncClient с HTTP/2 (несколько запросов мультиплексируются в одном соединении)
+    и пулом соединений, ограниченным max_connections / max_keepalive_connections.
+    Сессию нужно закрыть через await client.aclose() или использовать как async with.
+    """
+    if server is None:
+        raise ValueError('Server must be defined.')
+
+    base_url = f'https://{server}/'
+    login_url = 'management/authenticate' if is_mgmt_server else 'slave/authenticate'
+
+    client = httpx.AsyncClient(
+        base_url=base_url,
+        verify=False,
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+    )
+    auth = MgmtAuth(
+        login_url=f'{base_url}{login_url}',
+        username=username,
+        password=password,
+        cache_key=get_token_cache_key(server, username, password, login_url) if use_token_cache else None,
+        refresh_on_401=refresh_on_401
+    )
+
+    cached_token = token_cache.get(auth.cache_key) if use_token_cache else None
+    if cached_token:
+        auth.token = cached_token
+        client.auth = auth
+        return client
+
+    async def login() -> str:
+        # Логин выполняется отдельным клиентом, чтобы возвращаемую сессию можно было открыть через async with
+        async with httpx.AsyncClient(base_url=base_url, verify=False) as login_client:
+            response = await login_client.post(login_url, json={"username": username, "password": password})
             if response.status_code == 401:
-                wait_time = random.uniform(1, 5)
-                time.sleep(wait_time)
-                response = client.post(login_url, json={"username": username, "password": password})
-            response.raise_for_status()
+                await asyncio.sleep(random.uniform(1, 5))
+                response = await login_client.post(login_url, json={"username": username, "password": password})
+        response.raise_for_status()
+
+        token = response.json().get("token")
+        if not token:
+            raise ValueError("Token not found in the response.")
+        return token
+
+    try:
+        auth.set_token(await (retry_policy or default_retry_policy).call_async(login, host=server))
+    except Exception:
+        await client.aclose()
+        raise
+
+    client.auth = auth
+    return client
+
+
+apikey_cache = SharedCache('mgmt_apikeys')
 
-            token = response.json().get("token")
-            if not token:
-                raise ValueError("Token not found in the response.")
 
-            client.headers.update({"Authorization": f"{token}"})
-            return client
+def list_apikeys(session: httpx.Client) -> list[dict]:
+    """
+    Возвращает список API-ключей МГМТ (ответ может быть как массивом, так и объектом с массивом внутри).
+    """
+    response = session.get('management/auth_settings/api_keys')
+    response.raise_for_status()
 
-        except Exception as ex:
-            if time.time() - start_time > timeout:
-                raise Exception(f'Timeout reached: the server is unavailable for {timeout / 60} minutes.') from ex
-            print(f'Error: {ex}. Retry after {retry_delay} seconds...')
-            time.sleep(retry_delay)
+    payload = response.json()
+    if isinstance(payload, dict):
+        payload = next((value for value in payload.values() if isinstance(value, list)), [])
+    return [item for item in payload if isinstance(item, dict)]
 
 
 def get_apikey(
     session: httpx.Client,
-    key_label: str
+    key_label: str,
+    rejected_key: str = None,
+    retry_policy: RetryPolicy = None
 ):
-    start_time = time.time()
-    timeout = 3 * 60
-    retry_delay = 15
+    """
+    Возвращает значение API-ключа с меткой key_label.\n
+    Выданные ключи кэшируются по (сервер, метка) в общем для xdist-воркеров кэше. Кэшированный ключ проверяется одним
+    запросом списка ключей: он переиспользуется, если ключ с этой меткой (и тем же id) всё ещё существует.
+    Если сервер отверг ключ, его значение передаётся в rejected_key: ключ перевыпускается, только если в кэше всё ещё
+    лежит именно он, иначе возвращается более новый ключ, уже выпущенный другим воркером.\n
+    Запрос списка ключей выполняется без блокировки кэша, под блокировкой - только отзыв и создание ключа.
+    Повторные попытки выполняются по retry_policy.
+    """
+    cache_key = f'{session.base_url.host}|{key_label}'
 
-    while True:
-        try:
-            response = session.get(f'management/auth_settings/api_keys')
-            response.raise_for_status()
+    def issue_apikey() -> str:
+        cached = apikey_cache.get(cache_key) or {}
+        cached_rejected = rejected_key is not None and cached.get('value') == rejected_key
+
+        existing = [item for item in list_apikeys(session) if item.get('label') == key_label]
+        if cached and existing and not cached_rejected:
+            if cached.get('id') is None or any(item.get('id') == cached['id'] for item in existing):
+                return cached['value']
 
-            pattern = re.compile(rf'"label":\s*"{key_label}"')
-            match = pattern.search(response.text)
+        with apikey_cache.transaction() as entries:
+            current = entries.get(cache_key, {}).get('value') or {}
+            if current.get('value') and current.get('value') not in (cached.get('value'), rejected_key):
+                return current['value']
 
-            if match:
+            if existing:
                 response = session.post(f'management/auth_settings/api_keys/revoke', json={"label": f"{key_label}"})
                 response.raise_for_status()
 
             response = session.post(f'management/auth_settings/api_keys/create', json={"label": f"{key_label}"})
             response.raise_for_status()
 
-            return response.json().get('value')
+            created = response.json()
+            entries[cache_key] = {'value': {'value': created.get('value'), 'id': created.get('id')}, 'expires_at': None}
+            return created.get('value')
 
-        except Exception as ex:
-            if time.time() - start_time > timeout:
-                raise Exception(f'Timeout reached: the server is unavailable for {timeout / 60} minutes.') from ex
-            print(f'Error: {ex}. Retry after {retry_delay} seconds...')
-            time.sleep(retry_delay)
+    return (retry_policy or default_retry_policy).call(issue_apikey, host=session.base_url.host)
 
 
 def any_keys_exist(data, keys_to_check):
     """
     Проверяет, присутствует ли хотя бы один конечный ключ из keys_to_check в data, игнорируя значения.
+    Для JsonView проверка выполняется по закэшированному набору путей ключей.
     Возвращает True, если хотя бы один ключ существует; иначе — False.
     """
+    if isinstance(data, JsonView):
+        return any(path in data.key_paths for path, _ in flatten_key_paths(keys_to_check))
+
     for key, value in keys_to_check.items():
         if isinstance(value, dict):
             if key in data and isinstance(data[key], dict) and any_keys_exist(data[key], value):
@@ -109,8 +347,15 @@ def all_keys_match(data, keys_to_check):
     """
     Проверяет, присутствуют ли все ключи и значения из keys_to_check в data.
     Преобразует все значения к строкам в нижнем регистре перед сравнением.
+    Для JsonView отсутствие ожидаемого ключа определяется сразу по закэшированному набору путей ключей.
     Возвращает True, если все ключи и значения совпадают; иначе — False.
     """
+    if isinstance(data, JsonView):
+        for path, value in flatten_key_paths(keys_to_check):
+            if str(value).lower() != 'none' and path not in data.key_paths:
+                return False
+        data = data.data
+
     for key, value in keys_to_check.items():
         if isinstance(value, dict):
             if key not in data or not isinstance(data[key], dict) or not all_keys_match(data[key], value):
@@ -123,6 +368,17 @@ def all_keys_match(data, keys_to_check):
     return True
 
 
+def flatten_key_paths(keys_to_check: dict, prefix: tuple = ()):
+    """
+    Возвращает пары (путь ключа в виде кортежа, значение) для всех конечных ключей из keys_to_check.
+    """
+    for key, value in keys_to_check.items():
+        if isinstance(value, dict):
+            yield from flatten_key_paths(value, prefix + (key,))
+        else:
+            yield prefix + (key,), value
+
+
 def deep_update(source, updates):
     if source is None:
         source = {}
@@ -143,74 +399,399 @@ def delete_key(data, key_paths):
     data.pop(keys[-1], None)
 
 
+class ConfigTransaction:
+    """
+    Транзакция над конфигурационным YAML-файлом на удалённом сервере.\n
+    При входе файл читается один раз (снимок), изменения update/delete применяются к локальной копии,
+    commit отправляет их одной записью. При выходе снимок восстанавливается, только если записанное
+    содержимое отличается от исходного. Если файла не было, при восстановлении он удаляется.\n
+    read() возвращает содержимое файла (None, если файла нет), write(content) записывает его
+    и возвращает True в случае успешной проверки записи, remove() удаляет файл и возвращает True, если его больше нет.
+    dump(config_data) преобразует конфигурацию в текст.
+    """
+
+    def __init__(
+        self,
+        read: Callable[[], str | None],
+        write: Callable[[str], bool],
+        remove: Callable[[], bool],
+        dump: Callable[[dict], str] = yaml.dump
+    ):
+        self.read = read
+        self.write = write
+        self.remove = remove
+        self.dump = dump
+        self.original_content = None
+        self.pushed_content = None
+        self.config_data = {}
+
+    def begin(self) -> 'ConfigTransaction':
+        self.original_content = self.read()
+        self.pushed_content = None
+        self.config_data = yaml.safe_load(self.original_content or '') or {}
+        return self
+
+    def update(self, new_config: dict) -> 'ConfigTransaction':
+        deep_update(self.config_data, new_config)
+        return self
+
+    def delete(self, *key_paths: str) -> 'ConfigTransaction':
+        for key_path in key_paths:
+            delete_key(self.config_data, key_path)
+        return self
+
+    def commit(self) -> bool:
+        """
+        Записывает накопленные изменения. Если содержимое не изменилось с последней записи (или со снимка),
+        запись не выполняется. Возвращает True, если файл содержит актуальную конфигурацию.
+        """
+        content = self.dump(self.config_data) if self.config_data else ''
+        current_content = self.original_content if self.pushed_content is None else self.pushed_content
+        if content == (current_content or ''):
+            return True
+
+        result = self.write(content)
+        self.pushed_content = content
+        return result
+
+    def rollback(self) -> bool:
+        """
+        Восстанавливает снимок, если после него была выполнена запись с другим содержимым.
+        Если при снимке файла не было, файл удаляется.
+        """
+        if self.pushed_content is None or self.pushed_content == self.original_content:
+            return True
+
+        if self.original_content is None:
+            result = self.remove()
+        else:
+            result = self.write(self.original_content)
+        self.pushed_content = None
+        return result
+
+    def __enter__(self) -> 'ConfigTransaction':
+        return self.begin()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.rollback()
+
+
+class JsonView:
+    """
+    Представление JSON-ответа для многократных проверок.\n
+    Сериализует данные в текст один раз и переиспользует его во всех regex-хелперах.
+    Данные после создания представления изменяться не должны.
+    """
+
+    def __init__(self, json_data: dict | list):
+        self.data = json_data
+        self._text = None
+        self._keys = None
+        self._key_paths = None
+
+    @classmethod
+    def from_response(cls, response: httpx.Response) -> 'JsonView':
+        return cls(response.json())
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = json.dumps(self.data)
+        return self._text
+
+    @property
+    def keys(self) -> set[str]:
+        if self._keys is None:
+            self._keys, self._key_paths = collect_keys(self.data)
+        return self._keys
+
+    @property
+    def key_paths(self) -> set[tuple]:
+        if self._key_paths is None:
+            self._keys, self._key_paths = collect_keys(self.data)
+        return self._key_paths
+
+
+def collect_keys(json_data: dict | list) -> tuple[set[str], set[tuple]]:
+    """
+    Обходит JSON один раз и собирает все ключи на любом уровне вложенности (включая элементы массивов),
+    а также пути ключей от корня, проходящие только через словари.\n
+    Возвращает кортеж (множество ключей, множество путей ключей).
+    """
+    keys, key_paths = set(), set()
+    stack = [(json_data, ())]
+
+    while stack:
+        node, path = stack.pop()
+        if isinstance(node, dict):
+            for key, value in node.items():
+                keys.add(str(key))
+                key_path = path + (key,) if path is not None else None
+                if key_path is not None:
+                    key_paths.add(key_path)
+                if isinstance(value, (dict, list)):
+                    stack.append((value, key_path))
+        elif isinstance(node, list):
+            stack.extend((item, None) for item in node if isinstance(item, (dict, list)))
+
+    return keys, key_paths
+
+
+def unwrap_json(json_data: dict | list | JsonView) -> dict | list:
+    return json_data.data if isinstance(json_data, JsonView) else json_data
+
+
+def serialize_json(json_data: dict | list | JsonView) -> str:
+    return json_data.text if isinstance(json_data, JsonView) else json.dumps(json_data)
+
+
+compile_regex = functools.lru_cache(maxsize=512)(re.compile)
+
+
+# Простые пути вида 'a.b[0].c' вычисляются напрямую, без разбора выражения jsonpath_ng
+SIMPLE_JSON_PATH = re.compile(r'^(?:\$\.)?[A-Za-z_][A-Za-z0-9_]*(?:\[\d+\])*(?:\.[A-Za-z_][A-Za-z0-9_]*(?:\[\d+\])*)*$')
+JSON_PATH_STEP = re.compile(r'([A-Za-z_][A-Za-z0-9_]*)|\[(\d+)\]')
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_json_path(key_path: str):
+    """
+    Компиляция JSON-пути с кэшированием.\n
+    Простые пути (например, 'data.items[0].id') компилируются в кортеж шагов - ключей и индексов,
+    остальные выражения разбираются jsonpath_ng. Слова, которые jsonpath_ng считает служебными, всегда передаются ему.
+    """
+    if SIMPLE_JSON_PATH.match(key_path):
+        steps = tuple(
+            name if name else int(index)
+            for name, index in JSON_PATH_STEP.findall(key_path.removeprefix('$.'))
+        )
+        if not any(
+            isinstance(step, str) and (step in ('where', 'wherenot') or step.startswith(('true', 'false')))
+            for step in steps
+        ):
+            return steps
+    return parse(key_path)
+
+
+def find_json_values(
+    json_data: dict | list | JsonView,
+    key_path: str
+) -> list:
+    """
+    Поиск значений по JSON-пути.\n
+    Возвращает список найденных значений (для простых путей - не более одного), либо пустой список.
+    """
+    json_data = unwrap_json(json_data)
+    jsonpath_expr = compile_json_path(key_path)
+    if not isinstance(jsonpath_expr, tuple):
+        return [match.value for match in jsonpath_expr.find(json_data)]
+
+    data_element = json_data
+    for step in jsonpath_expr:
+        if isinstance(step, int):
+            if not isinstance(data_element, list) or step >= len(data_element):
+                return []
+        elif not isinstance(data_element, dict) or step not in data_element:
+            return []
+        data_element = data_element[step]
+    return [data_element]
+
+
 def check_json_path(
-    json_data: dict | list,
+    json_data: dict | list | JsonView,
     key_path: str
 ) -> bool:
     """
     Проверка наличия ключа в JSON-ответе по пути (например, 'data.items').\n
     Возвращает True, если хотя бы 1 указанный элемент найден, и False, если нет.
     """
-    jsonpath_expr = parse(key_path)
-    matches = jsonpath_expr.find(json_data)
-    return len(matches) > 0
+    return len(find_json_values(json_data, key_path)) > 0
 
 
 def get_json_count(
-    json_data: dict | list,
+    json_data: dict | list | JsonView,
     key_path: str
 ) -> int:
     """
     Подсчет количества элементов в JSON-массиве по указанному пути.\n
     Возвращает количество найденных элементов. Если не найдено ни одного - возвращает 0.
     """
-    jsonpath_expr = parse(key_path)
-    matches = jsonpath_expr.find(json_data)
-    if matches and isinstance(matches[0].value, list):
-        return len(matches[0].value)
+    matches = find_json_values(json_data, key_path)
+    if matches and isinstance(matches[0], list):
+        return len(matches[0])
     return 0
 
 
 def get_json_value(
-    json_data: dict | list,
+    json_data: dict | list | JsonView,
     key_path: str
 ) -> str | None:
     """
     Получение значения атрибута по указанному JSON-пути.\n
     Возвращает значение найденного элемента либо None.
     """
-    jsonpath_expr = parse(key_path)
-    matches = jsonpath_expr.find(json_data)
-    return matches[0].value if matches else None
+    matches = find_json_values(json_data, key_path)
+    return matches[0] if matches else None
+
+
+class IterBytesReader:
+    """
+    Файлоподобная обёртка над итератором байтов (например, httpx.Response.iter_bytes()) для потокового разбора ijson.
+    """
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._buffer = b''
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+
+        if size < 0:
+            data, self._buffer = self._buffer, b''
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def evaluate_json_stream(
+    chunks: Iterable[bytes],
+    key_path: str,
+    mode: Literal['exists', 'count', 'value'] = 'value'
+):
+    """
+    Потоковое вычисление простого JSON-пути (например, 'content[0].id') по фрагментам тела ответа без построения всего документа.\n
+    mode='exists' - наличие элемента (как check_json_path), mode='count' - количество элементов массива (как get_json_count),
+    mode='value' - значение первого найденного элемента (как get_json_value). В памяти собирается только найденный элемент,
+    разбор прекращается сразу после получения результата.
+    """
+    steps = compile_json_path(key_path)
+    if not isinstance(steps, tuple):
+        raise ValueError(f"Streaming mode supports only simple paths like 'a.b[0].c', got '{key_path}'.")
+
+    target = list(steps)
+    path, containers = [], []
+    events = ijson.parse(IterBytesReader(chunks), use_float=True)
+
+    for _, event, value in events:
+        if event == 'map_key':
+            path[-1] = value
+            continue
+        if event in ('end_map', 'end_array'):
+            containers.pop()
+            path.pop()
+            continue
+
+        if containers and containers[-1] == 'array':
+            path[-1] += 1
+
+        if len(path) == len(target) and path == target:
+            if mode == 'exists':
+                return True
+            if mode == 'count':
+                return count_stream_array_items(events) if event == 'start_array' else 0
+            if event not in ('start_map', 'start_array'):
+                return value
+            return build_stream_value(events, event)
+
+        if event == 'start_map':
+            containers.append('map')
+            path.append(None)
+        elif event == 'start_array':
+            containers.append('array')
+            path.append(-1)
+
+    return {'exists': False, 'count': 0, 'value': None}[mode]
+
+
+def count_stream_array_items(events) -> int:
+    depth, count = 1, 0
+    for _, event, _ in events:
+        if event in ('start_map', 'start_array'):
+            if depth == 1:
+                count += 1
+            depth += 1
+        elif event in ('end_map', 'end_array'):
+            depth -= 1
+            if depth == 0:
+                break
+        elif event != 'map_key' and depth == 1:
+            count += 1
+    return count
+
+
+def build_stream_value(events, start_event: str):
+    builder = ijson.ObjectBuilder()
+    builder.event(start_event, None)
+    depth = 1
+    for _, event, value in events:
+        builder.event(event, value)
+        if event in ('start_map', 'start_array'):
+            depth += 1
+        elif event in ('end_map', 'end_array'):
+            depth -= 1
+            if depth == 0:
+                break
+    return builder.value
+
+
+def stream_json_path(
+    session: httpx.Client,
+    url: str,
+    key_path: str,
+    mode: Literal['exists', 'count', 'value'] = 'value',
+    request_method: Literal['GET', 'POST', 'PUT', 'PATCH', 'DELETE'] = 'GET',
+    params: dict = None,
+    data: dict = None,
+):
+    """
+    Выполняет запрос и вычисляет JSON-путь по телу ответа в потоковом режиме (см. evaluate_json_stream).
+    Подходит для больших списков МГМТ: потребление памяти не зависит от размера ответа.
+    """
+    with session.stream(request_method.upper(), url, params=params, json=data) as response:
+        response.raise_for_status()
+        return evaluate_json_stream(response.iter_bytes(), key_path, mode)
+
+
+def stream_check_json_path(session: httpx.Client, url: str, key_path: str, **kwargs) -> bool:
+    return stream_json_path(session, url, key_path, 'exists', **kwargs)
+
+
+def stream_get_json_count(session: httpx.Client, url: str, key_path: str, **kwargs) -> int:
+    return stream_json_path(session, url, key_path, 'count', **kwargs)
+
+
+def stream_get_json_value(session: httpx.Client, url: str, key_path: str, **kwargs):
+    return stream_json_path(session, url, key_path, 'value', **kwargs)
 
 
 def check_regex(
-    json_data: dict | list,
+    json_data: dict | list | JsonView,
     regex: str
 ) -> bool:
     """
     Проверка наличия ключа в тексте ответа по регулярному выражению.\n
     Возвращает True, если хотя бы 1 указанный элемент найден, и False, если нет.
     """
-    response_text = json.dumps(json_data)
-    return bool(re.search(regex, response_text))
+    return bool(compile_regex(regex).search(serialize_json(json_data)))
 
 
 def get_regex_count(
-    json_data: dict | list,
+    json_data: dict | list | JsonView,
     regex: str
 ) -> int:
     """
     Подсчёт количества совпадений в тексте ответа по регулярному выражению.\n
     Возвращает количество найденных элементов. Если не найдено ни одного - возвращает 0.
     """
-    response_text = json.dumps(json_data)
-    matches = re.findall(regex, response_text)
-    return len(matches)
+    return sum(1 for _ in compile_regex(regex).finditer(serialize_json(json_data)))
 
 
 def get_regex_value(
-    json_data: dict | list,
+    json_data: dict | list | JsonView,
     regex: str,
     match_number: int = 1
 ) -> str | None:
@@ -218,8 +799,7 @@ def get_regex_value(
     Получение значения из первой группы по регулярному выражению и номеру совпадения.\n
     Возвращает значение найденного элемента либо None.
     """
-    response_text = json.dumps(json_data)
-    matches = re.finditer(regex, response_text)
+    matches = compile_regex(regex).finditer(serialize_json(json_data))
     for i, match in enumerate(matches, start=1):
         if i == match_number:
             return match.group(1)
@@ -227,19 +807,20 @@ def get_regex_value(
 
 
 def check_required_fields(
-    json_data: dict | list,
+    json_data: dict | list | JsonView,
     required_fields: list
 ) -> bool:
     """
     Проверка наличия обязательных полей в теле ответа.\n
     Возвращает True только если все перечисленные ключи присутствуют в теле ответа на любом уровне вложенности.
+    Ключи собираются за один обход данных (для JsonView - один раз на ответ), совпадения в строковых значениях не учитываются.
     """
-    response_text = json.dumps(json_data)
-    return all(re.search(rf'"{field}":', response_text) for field in required_fields)
+    keys = json_data.keys if isinstance(json_data, JsonView) else collect_keys(json_data)[0]
+    return all(field in keys for field in required_fields)
 
 
 def check_unique_value(
-    json_data: dict | list,
+    json_data: dict | list | JsonView,
     path: str
 ) -> bool:
     """
@@ -250,7 +831,7 @@ def check_unique_value(
     Возвращает True только если все значения указанного ключа уникальны внутри массива, иначе False.
     """
     keys = path.split('.')
-    data_element = json_data
+    data_element = unwrap_json(json_data)
 
     for i, key in enumerate(keys):
 
@@ -276,6 +857,195 @@ def check_unique_value(
     return False
 
 
+@dataclass
+class WaitResult:
+    matched: bool
+    matched_conditions: dict[str, float] = field(default_factory=dict)
+    requests_count: int = 0
+    elapsed: float = 0.0
+
+    def __bool__(self):
+        return self.matched
+
+
+def evaluate_condition(
+    key_path: str,
+    expected,
+    json_data: dict | list
+) -> bool:
+    """
+    Проверяет одно условие ожидания: если expected равен None - наличие элемента по пути,
+    если expected вызываемый - результат предиката от найденного значения, иначе - равенство значению.
+    """
+    matches = find_json_values(json_data, key_path)
+    if expected is None:
+        return len(matches) > 0
+    if not matches:
+        return False
+    if callable(expected):
+        return bool(expected(matches[0]))
+    return matches[0] == expected
+
+
+class ConditionPoller:
+    """
+    Общая логика ожидания условий для wait_for_conditions и wait_for_conditions_async:
+    разбор ответов, условные заголовки, экспоненциальная пауза и учёт времени.
+    """
+
+    def __init__(
+        self,
+        conditions: dict,
+        mode: Literal['all', 'any'],
+        request_method: str,
+        timeout: float,
+        initial_delay: float,
+        max_delay: float,
+        backoff_factor: float,
+        jitter: float
+    ):
+        self.conditions = conditions
+        self.mode = mode
+        self.request_method = request_method.upper()
+        self.timeout = timeout
+        self.max_delay = max_delay
+        self.backoff_factor = backoff_factor
+        self.jitter = jitter
+        self.delay = initial_delay
+        self.conditional_headers = {}
+        self.last_content = None
+        self.result = WaitResult(matched=False)
+        self.start_time = time.time()
+
+    def request_kwargs(self, url: str, params: dict, data: dict) -> dict:
+        return {
+            'method': self.request_method,
+            'url': url,
+            'params': params,
+            'json': data,
+            'headers': self.conditional_headers,
+        }
+
+    def handle(self, response: httpx.Response) -> bool:
+        """
+        Обрабатывает ответ. Возвращает True, если ожидание завершено успешно.
+        Ошибки 429 и 5xx считаются временными, остальные ошибочные статусы пробрасываются.
+        """
+        self.result.requests_count += 1
+
+        if response.status_code == 304 or response.status_code == 429 or response.status_code >= 500:
+            return False
+        response.raise_for_status()
+
+        if self.request_method == 'GET':
+            if 'etag' in response.headers:
+                self.conditional_headers['If-None-Match'] = response.headers['etag']
+            if 'last-modified' in response.headers:
+                self.conditional_headers['If-Modified-Since'] = response.headers['last-modified']
+
+        if response.content == self.last_content:
+            return False
+        self.last_content = response.content
+
+        response_json = response.json()
+        elapsed = time.time() - self.start_time
+
+        satisfied = [key for key, expected in self.conditions.items()
+                     if evaluate_condition(key, expected, response_json)]
+        for key in satisfied:
+            self.result.matched_conditions.setdefault(key, elapsed)
+
+        if satisfied and (self.mode == 'any' or len(satisfied) == len(self.conditions)):
+            self.result.matched = True
+            self.result.elapsed = elapsed
+            return True
+        return False
+
+    def next_delay(self) -> float | None:
+        """
+        Возвращает паузу до следующего запроса, либо None, если время ожидания истекло.
+        """
+        elapsed = time.time() - self.start_time
+        if elapsed >= self.timeout:
+            self.result.elapsed = elapsed
+            return None
+
+        sleep_time = min(self.delay, self.max_delay) * random.uniform(1 - self.jitter, 1 + self.jitter)
+        self.delay = min(self.delay * self.backoff_factor, self.max_delay)
+        return min(sleep_time, self.timeout - elapsed)
+
+
+def wait_for_conditions(
+    session: httpx.Client,
+    url: str,
+    conditions: dict,
+    mode: Literal['all', 'any'] = 'all',
+    request_method: Literal['GET', 'POST', 'PUT', 'PATCH', 'DELETE'] = 'GET',
+    timeout: float = 20,
+    initial_delay: float = 0.25,
+    max_delay: float = 2.0,
+    backoff_factor: float = 2.0,
+    jitter: float = 0.2,
+    params: dict = None,
+    data: dict = None,
+) -> WaitResult:
+    """
+    Ожидание выполнения нескольких условий в ответе с повторными запросами.\n
+    conditions - словарь {путь: ожидание}, путь прописывается от корня (pageable.sort.empty). Ожидание None проверяет
+    только наличие ключа, вызываемый объект используется как предикат от найденного значения, иначе значение сравнивается
+    на равенство. mode='all' ждёт выполнения всех условий в одном ответе, mode='any' - хотя бы одного.\n
+    Пауза между запросами растёт экспоненциально от initial_delay до max_delay со случайным отклонением jitter.
+    GET-запросы отправляются с If-None-Match/If-Modified-Since, если сервер вернул ETag/Last-Modified, а неизменившееся
+    тело ответа повторно не разбирается. Сетевые ошибки, 429 и 5xx считаются временными и не прерывают ожидание.\n
+    Возвращает WaitResult: признак успеха, время (в секундах от начала) первого выполнения каждого условия и число запросов.
+    """
+    poller = ConditionPoller(conditions, mode, request_method, timeout, initial_delay, max_delay, backoff_factor, jitter)
+
+    while True:
+        try:
+            if poller.handle(session.request(**poller.request_kwargs(url, params, data))):
+                return poller.result
+        except (httpx.TransportError, ValueError):
+            pass
+
+        delay = poller.next_delay()
+        if delay is None:
+            return poller.result
+        time.sleep(delay)
+
+
+async def wait_for_conditions_async(
+    session: httpx.AsyncClient,
+    url: str,
+    conditions: dict,
+    mode: Literal['all', 'any'] = 'all',
+    request_method: Literal['GET', 'POST', 'PUT', 'PATCH', 'DELETE'] = 'GET',
+    timeout: float = 20,
+    initial_delay: float = 0.25,
+    max_delay: float = 2.0,
+    backoff_factor: float = 2.0,
+    jitter: float = 0.2,
+    params: dict = None,
+    data: dict = None,
+) -> WaitResult:
+    """
+    Асинхронный аналог wait_for_conditions для сессии из get_session_async.
+    """
+    poller = ConditionPoller(conditions, mode, request_method, timeout, initial_delay, max_delay, backoff_factor, jitter)
+
+    while True:
+        try:
+            if poller.handle(await session.request(**poller.request_kwargs(url, params, data))):
+                return poller.result
+        except (httpx.TransportError, ValueError):
+            pass
+
+        delay = poller.next_delay()
+        if delay is None:
+            return poller.result
+        await asyncio.sleep(delay)
+
+
 def wait_for_element_in_response(
     session: httpx.Client,
     url: str,
@@ -290,32 +1060,43 @@ def wait_for_element_in_response(
     """
     Ожидание появления элемента в ответе с проверкой пары ключ-значение и повторными запросами.\n
     Если value не передан, проверяется только наличие ключа в ответе. Путь к key прописывается от корня (pageable.sort.empty)\n
+    Пауза между запросами растёт экспоненциально и ограничена retry_delay (см. wait_for_conditions).\n
     Возвращает True, если за время timeout появляется указанный ключ с его значением (если value передан).
     """
-    start_time = time.time()
-
-    while time.time() - start_time < timeout:
-        response = session.request(
-            method=request_method.upper(),
-            url=url,
-            params=params,
-            json=data,
-        )
-        response.raise_for_status()
-
-        try:
-            response_json = response.json()
-
-            if value is not None:
-                if get_json_value(response_json, key) == value:
-                    return True
-            else:
-                if check_json_path(response_json, key):
-                    return True
-
-        except ValueError:
-            pass
+    return wait_for_conditions(
+        session,
+        url,
+        {key: value},
+        request_method=request_method,
+        timeout=timeout,
+        max_delay=retry_delay,
+        params=params,
+        data=data,
+    ).matched
 
-        time.sleep(retry_delay)
 
-    return False
+async def wait_for_element_in_response_async(
+    session: httpx.AsyncClient,
+    url: str,
+    key: str,
+    value: str | int | float | bool | list | dict = None,
+    request_method: Literal['GET', 'POST', 'PUT', 'PATCH', 'DELETE'] = 'GET',
+    timeout: int = 20,
+    retry_delay: float = 2.0,
+    params: dict = None,
+    data: dict = None,
+) -> bool:
+    """
+    Асинхронный аналог wait_for_element_in_response. Позволяет выполнять десятки проверок одновременно через asyncio.gather.
+    """
+    result = await wait_for_conditions_async(
+        session,
+        url,
+        {key: value},
+        request_method=request_method,
+        timeout=timeout,
+        max_delay=retry_delay,
+        params=params,
+        data=data,
+    )
+    return result.matched
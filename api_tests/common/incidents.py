@@ -0,0 +1,255 @@
+import bisect
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Literal
+import httpx
+from api_tests.common import base
+
+
+logger = logging.getLogger(__name__)
+
+# JSON-пути к полям инцидента, по которым выполняется сопоставление с триггерами
+INCIDENT_FIELDS = {
+    'trap': 'trapIp',
+    'protocol': 'type',
+    'source': 'sourceIp',
+    'time': 'date',
+    **base.config.get('mgmt', {}).get('incident_fields', {})
+}
+
+
+def parse_timestamp(value) -> float | None:
+    """
+    Преобразует время инцидента (секунды или миллисекунды с начала эпохи, либо строку в формате ISO 8601) в Unix-время.
+    Возвращает None, если значение не удалось распознать.
+    """
+    if isinstance(value, str) and value.strip().isdigit():
+        value = int(value)
+
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value / 1000 if value > 1e11 else float(value)
+
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value.strip().replace('Z', '+00:00')).timestamp()
+        except ValueError:
+            return None
+
+    return None
+
+
+@dataclass
+class Expectation:
+    trap: str
+    protocol: str
+    source: str | None = None
+    triggered_at: float = field(default_factory=time.time)
+    window: float = 120
+    incident: dict | None = None
+    incident_time: float | None = None
+    seen_at: float | None = None
+
+    @property
+    def resolved(self) -> bool:
+        return self.incident is not None
+
+    @property
+    def detection_latency(self) -> float | None:
+        """Время от срабатывания триггера до времени создания инцидента на МГМТ."""
+        if self.incident_time is None:
+            return None
+        return self.incident_time - self.triggered_at
+
+    @property
+    def observed_latency(self) -> float | None:
+        """Время от срабатывания триггера до момента, когда инцидент был получен из API."""
+        if self.seen_at is None:
+            return None
+        return self.seen_at - self.triggered_at
+
+
+class IncidentCorrelator:
+    """
+    Сопоставляет множество ожидаемых инцидентов с одним списком инцидентов МГМТ.\n
+    За один цикл опроса выполняется один запрос к url, по ответу строится индекс
+    (ловушка, протокол, источник) -> отсортированный список времён инцидентов, и из него
+    разрешаются все ожидания, время инцидента которых попадает в окно [triggered_at, triggered_at + window].
+    """
+
+    def __init__(
+        self,
+        session: httpx.Client,
+        url: str = 'management/incidents',
+        items_path: str = 'content',
+        fields: dict = None,
+        request_method: Literal['GET', 'POST'] = 'GET',
+        params: dict = None,
+        data: dict = None,
+        clock_skew: float = 5
+    ):
+        self.session = session
+        self.url = url
+        self.items_path = items_path
+        self.fields = {**INCIDENT_FIELDS, **(fields or {})}
+        self.request_method = request_method
+        self.params = params
+        self.data = data
+        self.clock_skew = clock_skew
+        self.expectations: list[Expectation] = []
+        self.used_incidents: set = set()
+        self.requests_count = 0
+
+    def expect(
+        self,
+        trap: str,
+        protocol: str,
+        source: str = None,
+        triggered_at: float = None,
+        window: float = 120
+    ) -> Expectation:
+        """
+        Регистрирует ожидание инцидента от ловушки trap по протоколу protocol (и источнику source, если он указан).
+        Если triggered_at не передан, используется текущее время.
+        """
+        expectation = Expectation(trap, protocol, source, triggered_at or time.time(), window)
+        self.expectations.append(expectation)
+        return expectation
+
+    @property
+    def pending(self) -> list[Expectation]:
+        return [expectation for expectation in self.expectations if not expectation.resolved]
+
+    def fetch_incidents(self) -> list[dict]:
+        response = self.session.request(self.request_method, self.url, params=self.params, json=self.data)
+        self.requests_count += 1
+        response.raise_for_status()
+
+        payload = response.json()
+        items = base.get_json_value(payload, self.items_path) if self.items_path else payload
+        return items if isinstance(items, list) else []
+
+    def build_index(self, incidents: list[dict]) -> dict[tuple, list[tuple[float, int]]]:
+        """
+        Строит индекс (ловушка, протокол, источник) -> отсортированный список (время, номер инцидента).
+        Каждый инцидент также попадает под ключ с источником None, чтобы ожидания без источника находили его.
+        Инциденты, время которых не удалось распознать, пропускаются: их нельзя отнести ни к одному окну ожидания.
+        """
+        index = {}
+
+        for number, incident in enumerate(incidents):
+            trap = base.get_json_value(incident, self.fields['trap'])
+            protocol = base.get_json_value(incident, self.fields['protocol'])
+            if trap is None or protocol is None:
+                continue
+
+            source = base.get_json_value(incident, self.fields['source'])
+            raw_time = base.get_json_value(incident, self.fields['time'])
+            incident_time = parse_timestamp(raw_time)
+            if incident_time is None:
+                logger.warning('Incident %s/%s has unparseable time %r and is skipped.', trap, protocol, raw_time)
+                continue
+            entry = (incident_time, number)
+
+            trap, protocol = str(trap), str(protocol).lower()
+            index.setdefault((trap, protocol, None), []).append(entry)
+            if source is not None:
+                index.setdefault((trap, protocol, str(source)), []).append(entry)
+
+        for entries in index.values():
+            entries.sort()
+        return index
+
+    @staticmethod
+    def incident_key(incident: dict):
+        """
+        Идентификатор инцидента между циклами опроса: поле id, если оно есть, иначе содержимое инцидента.
+        """
+        if isinstance(incident, dict) and incident.get('id') is not None:
+            return ('id', str(incident['id']))
+        return ('content', repr(sorted(incident.items())) if isinstance(incident, dict) else repr(incident))
+
+    def poll(self) -> list[Expectation]:
+        """
+        Выполняет один цикл опроса и разрешает все ожидания, для которых нашёлся инцидент.
+        Каждый инцидент разрешает не более одного ожидания: ожидания обрабатываются в порядке срабатывания триггеров
+        и получают самый ранний ещё не использованный инцидент в своём окне.
+        Возвращает список ожиданий, разрешённых в этом цикле.
+        """
+        pending = self.pending
+        if not pending:
+            return []
+
+        incidents = self.fetch_incidents()
+        index = self.build_index(incidents)
+        seen_at = time.time()
+        resolved = []
+
+        for expectation in sorted(pending, key=lambda item: item.triggered_at):
+            entries = index.get((str(expectation.trap), expectation.protocol.lower(), expectation.source), [])
+            position = bisect.bisect_left(entries, (expectation.triggered_at - self.clock_skew, -1))
+            while position < len(entries) and entries[position][0] <= expectation.triggered_at + expectation.window:
+                incident_time, number = entries[position]
+                incident_key = self.incident_key(incidents[number])
+                if incident_key not in self.used_incidents:
+                    self.used_incidents.add(incident_key)
+                    expectation.incident_time = incident_time
+                    expectation.incident = incidents[number]
+                    expectation.seen_at = seen_at
+                    resolved.append(expectation)
+                    break
+                position += 1
+
+        return resolved
+
+    def wait(
+        self,
+        timeout: float = 90,
+        retry_delay: float = 2.0
+    ) -> bool:
+        """
+        Опрашивает список инцидентов раз в retry_delay секунд, пока не будут разрешены все ожидания или не истечёт timeout.
+        Временные ошибки сети и ответы 5xx не прерывают ожидание.
+        Возвращает True, если все ожидания разрешены.
+        """
+        start_time = time.time()
+
+        while True:
+            try:
+                self.poll()
+            except (httpx.TransportError, ValueError):
+                pass
+            except httpx.HTTPStatusError as ex:
+                if ex.response.status_code < 500:
+                    raise
+
+            if not self.pending:
+                return True
+            if time.time() - start_time + retry_delay > timeout:
+                return False
+            time.sleep(retry_delay)
+
+    def report(self) -> list[dict]:
+        """
+        Возвращает сводку по всем ожиданиям с задержками обнаружения в секундах.
+        """
+        return [
+            {
+                'trap': expectation.trap,
+                'protocol': expectation.protocol,
+                'source': expectation.source,
+                'resolved': expectation.resolved,
+                'detection_latency': expectation.detection_latency,
+                'observed_latency': expectation.observed_latency,
+            }
+            for expectation in self.expectations
+        ]
+
+
+# correlator = IncidentCorrelator(base.get_session(), params={'size': 200, 'sort': 'date,desc'})
+# triggered_at = time.time()
+# for trap in ['172.16.5.121', '172.16.5.122']:
+#     correlator.expect(trap, 'ssh', triggered_at=triggered_at)
+#     correlator.expect(trap, 'ftp', triggered_at=triggered_at)
+# print(correlator.wait(), correlator.requests_count, correlator.report())
@@ -0,0 +1,50 @@
+"""
+Микро-бенчмарк JSON-хелперов base.py на больших ответах МГМТ.
+Запуск из корня репозитория: python -m api_tests.common.json_path_benchmark
+"""
+import timeit
+from jsonpath_ng.ext import parse
+from api_tests.common import base
+
+
+def make_incidents_payload(items_count: int = 5000) -> dict:
+    return {
+        'content': [
+            {
+                'id': i,
+                'trapIp': f'172.16.{i // 250}.{i % 250}',
+                'type': ('SSH', 'FTP', 'SMB', 'WEB')[i % 4],
+                'sourceIp': '172.16.5.10',
+                'date': 1700000000000 + i,
+                'details': {'login': 'root', 'password': 'qwerty', 'tags': ['decoy', 'trap']},
+            }
+            for i in range(items_count)
+        ],
+        'pageable': {'sort': {'empty': True}, 'pageNumber': 0, 'pageSize': items_count},
+        'totalElements': items_count,
+    }
+
+
+def uncached_get_json_value(json_data, key_path):
+    matches = parse(key_path).find(json_data)
+    return matches[0].value if matches else None
+
+
+def run(number: int = 2000):
+    payload = make_incidents_payload()
+    cases = {
+        'simple path': 'content[4999].details.login',
+        'filter expression': 'content[?id = 3].trapIp',
+    }
+
+    for title, key_path in cases.items():
+        assert uncached_get_json_value(payload, key_path) == base.get_json_value(payload, key_path)
+        case_number = number if title == 'simple path' else number // 100
+        uncached = timeit.timeit(lambda: uncached_get_json_value(payload, key_path), number=case_number)
+        cached = timeit.timeit(lambda: base.get_json_value(payload, key_path), number=case_number)
+        print(f'{title:<18} parse on every call: {uncached / case_number * 1e6:10.1f} us   '
+              f'cached/fast path: {cached / case_number * 1e6:10.1f} us   speedup: x{uncached / cached:.1f}')
+
+
+if __name__ == '__main__':
+    run()
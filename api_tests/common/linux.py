@@ -1,7 +1,15 @@
+import atexit
+import hashlib
+import io
+import posixpath
 import re
-import sys
+import select
+import threading
 import time
-from typing import Literal
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Literal
 import yaml
 import paramiko
 from api_tests.common import base
@@ -15,44 +23,115 @@ def load_config(config_path='config.yaml'):
 
 config = load_config()
 
+# Выполнять привилегированные команды хелперов через постоянную оболочку root (см. RootShell)
+USE_ROOT_SHELL = config.get('linux', {}).get('use_root_shell', False)
+
+
+def detect_privilege_mode(
+    ssh_session: paramiko.SSHClient,
+    root_password: str = config.get('linux', {}).get('root_password', 'xello_root'),
+    refresh: bool = False
+) -> Literal['root', 'sudo', 'su']:
+    """
+    Определяет способ повышения привилегий на сервере одной удалённой командой: root (пользователь уже root),
+    sudo (пользователь может выполнять sudo) или su. Для sudo также определяется, запрашивает ли он пароль
+    (атрибут подключения sudo_password_required, False при правиле NOPASSWD). Результат кэшируется на подключении,
+    refresh == True выполняет проверку заново.
+    """
+    privilege_mode = getattr(ssh_session, 'privilege_mode', None)
+    if privilege_mode and not refresh:
+        return privilege_mode
+
+    probe_command = (
+        'if [ "$(id -u)" = "0" ]; then echo root; '
+        'elif sudo -k -n true >/dev/null 2>&1; then echo sudo-nopasswd; '
+        f"elif echo '{root_password}' | sudo -S -p '' true >/dev/null 2>&1; then echo sudo; "
+        'else echo su; fi'
+    )
+    _, stdout, _ = ssh_session.exec_command(probe_command)
+    output = stdout.read().decode().split()
+
+    probe_result = output[-1] if output and output[-1] in ('root', 'sudo-nopasswd', 'sudo', 'su') else 'su'
+    privilege_mode = 'sudo' if probe_result == 'sudo-nopasswd' else probe_result
+    ssh_session.sudo_password_required = probe_result == 'sudo'
+    ssh_session.privilege_mode = privilege_mode
+    return privilege_mode
+
 
 def execute_with_privileges(
     ssh_session: paramiko.SSHClient,
     command: str,
-    root_password: str = config.get('linux', {}).get('root_password', 'xello_root')
+    root_password: str = config.get('linux', {}).get('root_password', 'xello_root'),
+    refresh_privilege_mode: bool = False
 ):
     """
-    Выполняет команду с правами sudo, а если не удается из-за отсутствия привилегий,
-    выполняет команду от имени root. Возвращает stdin, stdout и stderr.
+    Выполняет команду с повышенными привилегиями способом, определённым detect_privilege_mode
+    (один раз на подключение): напрямую, через sudo или от имени root через su. Возвращает stdin, stdout и stderr.
     """
-    sudo_command = f"echo '{root_password}' | sudo -S {command}"
-    stdin, stdout, stderr = ssh_session.exec_command(sudo_command)
-    error = stderr.read().decode()
+    privilege_mode = detect_privilege_mode(ssh_session, root_password, refresh_privilege_mode)
+
+    if privilege_mode == 'root':
+        privileged_command = command
+    elif privilege_mode == 'sudo' and not getattr(ssh_session, 'sudo_password_required', True):
+        privileged_command = f"sudo -n {command}"
+    elif privilege_mode == 'sudo':
+        privileged_command = f"echo '{root_password}' | sudo -S -p '' {command}"
+    else:
+        privileged_command = f"echo '{root_password}' | su -c \"{command}\""
+
+    return ssh_session.exec_command(privileged_command)
 
-    if "is not in the sudoers file" in error or "permission denied" in error:
-        root_command = f"echo '{root_password}' | su -c \"{command}\""
-        stdin, stdout, stderr = ssh_session.exec_command(root_command)
 
-    return stdin, stdout, stderr
+@dataclass
+class CommandResult:
+    exit_code: int
+    stdout: str
+    stderr: str
+
+    @property
+    def ok(self) -> bool:
+        return self.exit_code == 0
+
+
+def run_privileged(
+    ssh_session: paramiko.SSHClient,
+    command: str,
+    root_password: str = config.get('linux', {}).get('root_password', 'xello_root'),
+    use_root_shell: bool = USE_ROOT_SHELL
+) -> CommandResult:
+    """
+    Выполняет команду с повышенными привилегиями и возвращает код завершения, stdout и stderr.
+    Если use_root_shell == True, команда выполняется в постоянной оболочке root (см. get_root_shell),
+    иначе — в отдельном канале через execute_with_privileges.
+    """
+    if use_root_shell:
+        return get_root_shell(ssh_session, root_password).run(command)
+
+    _, stdout, stderr = execute_with_privileges(ssh_session, command, root_password)
+    output = stdout.read().decode()
+    error = stderr.read().decode().replace("Password:", "").replace("Пароль:", "")
+    return CommandResult(stdout.channel.recv_exit_status(), output, error)
 
 
 def read_file_if_exists(
     ssh_session: paramiko.SSHClient,
     file_path: str,
-    root_password: str
-) -> str:
+    root_password: str,
+    use_root_shell: bool = USE_ROOT_SHELL,
+    missing: str | None = ""
+) -> str | None:
     """
     Проверяет существование файла и возвращает его содержимое, если он существует.
-    В противном случае возвращает пустую строку.
+    В противном случае возвращает missing (по умолчанию пустую строку).
     """
     check_file_command = f"cat {file_path}"
-    _, stdout, stderr = execute_with_privileges(ssh_session, check_file_command, root_password)
+    result = run_privileged(ssh_session, check_file_command, root_password, use_root_shell)
 
-    file_content = stdout.read().decode().strip()
-    error = stderr.read().decode().replace("Password:", "").replace("Пароль:", "").strip()
+    file_content = result.stdout.strip()
+    error = result.stderr.strip()
 
     if "No such file or directory" in error:
-        return ""
+        return missing
 
     if error:
         raise Exception(f"Failed to read file: {error}")
@@ -60,17 +139,56 @@ def read_file_if_exists(
     return file_content
 
 
-def get_ssh_connection(
+class PooledSSHClient(paramiko.SSHClient):
+    """
+    SSH-клиент из пула соединений. Хранит ключ пула (сервер, порт, пользователь)
+    и определённый для сервера способ повышения привилегий (см. detect_privilege_mode).
+    """
+
+    def __init__(self, pool_key: tuple):
+        super().__init__()
+        self.pool_key = pool_key
+        self.privilege_mode = None
+        self.sudo_password_required = True
+        self.root_shell = None
+        self.sftp = None
+
+    def is_healthy(self) -> bool:
+        transport = self.get_transport()
+        if transport is None or not transport.is_active() or not transport.is_authenticated():
+            return False
+        try:
+            transport.send_ignore()
+        except (EOFError, OSError, paramiko.SSHException):
+            return False
+        return True
+
+
+# Пул SSH-подключений текущего процесса (xdist-воркера): (сервер, порт, пользователь) -> клиент
+ssh_pool: dict[tuple, PooledSSHClient] = {}
+ssh_pool_locks: dict[tuple, threading.Lock] = {}
+ssh_pool_lock = threading.Lock()
+
+SSH_KEEPALIVE_INTERVAL = 30
+
+
+def open_ssh_connection(
     server: str,
-    username: str = config.get('linux', {}).get('username', 'xello'),
-    password: str = config.get('linux', {}).get('password', 'xello_root'),
-    port: int = 22
-) -> paramiko.SSHClient:
-    ssh = paramiko.SSHClient()
+    username: str,
+    password: str,
+    port: int = 22,
+    keepalive_interval: int = SSH_KEEPALIVE_INTERVAL
+) -> PooledSSHClient:
+    """
+    Открывает новое SSH-подключение, включает keepalive и проверяет (при необходимости устанавливает) наличие sudo.
+    При ошибке пробрасывает ConnectionError.
+    """
+    ssh = PooledSSHClient((server, port, username))
     ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
 
     try:
-        ssh.connect(server, port, username, password)
+        ssh.connect(server, port, username, password, timeout=15, banner_timeout=15, auth_timeout=15)
+        ssh.get_transport().set_keepalive(keepalive_interval)
 
         bash_command = f"""
             command_exists() {{
@@ -97,8 +215,284 @@ def get_ssh_connection(
         return ssh
 
     except Exception as ex:
-        print(f'Failed to get SSH connection with server IP "{server}": {ex}')
-        sys.exit(1)
+        ssh.close()
+        raise ConnectionError(f'Failed to get SSH connection with server IP "{server}": {ex}') from ex
+
+
+def get_ssh_connection(
+    server: str,
+    username: str = config.get('linux', {}).get('username', 'xello'),
+    password: str = config.get('linux', {}).get('password', 'xello_root'),
+    port: int = 22
+) -> paramiko.SSHClient:
+    """
+    Возвращает SSH-подключение к серверу из пула текущего воркера. Новое подключение открывается только при первом
+    обращении к (server, port, username) или если прежнее подключение разорвано.
+    """
+    pool_key = (server, port, username)
+    with ssh_pool_lock:
+        key_lock = ssh_pool_locks.setdefault(pool_key, threading.Lock())
+
+    with key_lock:
+        ssh = ssh_pool.get(pool_key)
+        if ssh is not None and ssh.is_healthy():
+            return ssh
+        if ssh is not None:
+            ssh.close()
+
+        ssh = open_ssh_connection(server, username, password, port)
+        ssh_pool[pool_key] = ssh
+        return ssh
+
+
+def close_ssh_connections():
+    """
+    Закрывает все подключения пула.
+    """
+    with ssh_pool_lock:
+        for ssh in ssh_pool.values():
+            ssh.close()
+        ssh_pool.clear()
+
+
+atexit.register(close_ssh_connections)
+
+
+class RootShell:
+    """
+    Постоянная оболочка bash с правами root в одном SSH-канале (повышение привилегий выполняется один раз при открытии).\n
+    Каждая команда выполняется в подоболочке со stdin из /dev/null и обрамляется уникальными маркерами в stdout
+    (вместе с кодом завершения) и в stderr, поэтому вывод и код каждой команды разделяются без открытия новых каналов.
+    run_many отправляет несколько команд одной записью в канал и собирает результаты по порядку.
+    При таймауте или разрыве канала оболочка закрывается и открывается заново при следующем вызове.
+    """
+
+    def __init__(
+        self,
+        ssh_session: paramiko.SSHClient,
+        root_password: str = config.get('linux', {}).get('root_password', 'xello_root'),
+        timeout: float = 60
+    ):
+        self.ssh_session = ssh_session
+        self.root_password = root_password
+        self.timeout = timeout
+        self.channel = None
+        self.stdout_buffer = b''
+        self.stderr_buffer = b''
+        self.lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self.channel is not None and not self.channel.closed and not self.channel.exit_status_ready()
+
+    def open(self):
+        privilege_mode = detect_privilege_mode(self.ssh_session, self.root_password)
+        # Пароль отправляется, только если его действительно прочитает sudo или su, иначе его выполнил бы bash
+        send_password = privilege_mode == 'su' or privilege_mode == 'sudo' and getattr(self.ssh_session, 'sudo_password_required', True)
+        shell_command = 'bash --noprofile --norc'
+        if privilege_mode == 'sudo' and send_password:
+            shell_command = f"sudo -k -S -p '' {shell_command}"
+        elif privilege_mode == 'sudo':
+            shell_command = f"sudo -n {shell_command}"
+        elif privilege_mode == 'su':
+            shell_command = f"su -c '{shell_command}'"
+
+        self.close()
+        self.channel = self.ssh_session.get_transport().open_session()
+        self.channel.exec_command(shell_command)
+        if send_password:
+            self.channel.sendall(f'{self.root_password}\n'.encode())
+
+        # Всё, что выведено до первого маркера (приглашения sudo/su), отбрасывается
+        marker, = self.send(['true'])
+        self.collect(marker, time.time() + self.timeout)
+
+    def close(self):
+        if self.channel is not None:
+            self.channel.close()
+        self.channel = None
+        self.stdout_buffer = b''
+        self.stderr_buffer = b''
+
+    def send(self, commands: list[str]) -> list[str]:
+        """
+        Отправляет команды одной записью в канал и возвращает их маркеры.
+        """
+        markers = [f'__ROOT_SHELL_{uuid.uuid4().hex}__' for _ in commands]
+        script = ''.join(
+            f'( {command}\n) < /dev/null\n'
+            f'printf "\\n{marker} %d\\n" $?\n'
+            f'printf "\\n{marker}\\n" >&2\n'
+            for command, marker in zip(commands, markers)
+        )
+        self.channel.sendall(script.encode())
+        return markers
+
+    def receive(self, deadline: float):
+        """
+        Дочитывает доступные данные stdout и stderr канала, при их отсутствии ждёт до deadline.
+        """
+        if self.channel.recv_ready() or self.channel.recv_stderr_ready():
+            while self.channel.recv_ready():
+                self.stdout_buffer += self.channel.recv(65536)
+            while self.channel.recv_stderr_ready():
+                self.stderr_buffer += self.channel.recv_stderr(65536)
+            return
+
+        if self.channel.closed or self.channel.exit_status_ready():
+            raise ConnectionError('Root shell has exited.')
+
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            raise TimeoutError('Root shell command timed out.')
+        select.select([self.channel], [], [], min(remaining, 1))
+
+    def collect(self, marker: str, deadline: float) -> CommandResult:
+        """
+        Ожидает маркеры команды в stdout и stderr и возвращает её результат, удаляя его из буферов.
+        """
+        stdout_marker = f'\n{marker} '.encode()
+        stderr_marker = f'\n{marker}\n'.encode()
+
+        while True:
+            stdout_end = self.stdout_buffer.find(stdout_marker)
+            line_end = self.stdout_buffer.find(b'\n', stdout_end + len(stdout_marker)) if stdout_end >= 0 else -1
+            stderr_end = self.stderr_buffer.find(stderr_marker)
+            if line_end >= 0 and stderr_end >= 0:
+                break
+            self.receive(deadline)
+
+        result = CommandResult(
+            int(self.stdout_buffer[stdout_end + len(stdout_marker):line_end]),
+            self.stdout_buffer[:stdout_end].decode(errors='replace'),
+            self.stderr_buffer[:stderr_end].decode(errors='replace')
+        )
+        self.stdout_buffer = self.stdout_buffer[line_end + 1:]
+        self.stderr_buffer = self.stderr_buffer[stderr_end + len(stderr_marker):]
+        return result
+
+    def run_many(self, commands: list[str], timeout: float = None) -> list[CommandResult]:
+        """
+        Выполняет команды по порядку за одну запись в канал. timeout ограничивает выполнение всех команд.
+        """
+        with self.lock:
+            try:
+                if not self.is_open:
+                    self.open()
+                deadline = time.time() + (timeout or self.timeout)
+                markers = self.send(commands)
+                return [self.collect(marker, deadline) for marker in markers]
+            except Exception:
+                self.close()
+                raise
+
+    def run(self, command: str, timeout: float = None) -> CommandResult:
+        return self.run_many([command], timeout)[0]
+
+
+def get_root_shell(
+    ssh_session: paramiko.SSHClient,
+    root_password: str = config.get('linux', {}).get('root_password', 'xello_root')
+) -> RootShell:
+    """
+    Возвращает постоянную оболочку root для подключения (одну на подключение, создаётся при первом обращении).
+    Переданный root_password используется при следующем открытии оболочки.
+    """
+    with ssh_pool_lock:
+        root_shell = getattr(ssh_session, 'root_shell', None)
+        if root_shell is None:
+            root_shell = RootShell(ssh_session, root_password)
+            ssh_session.root_shell = root_shell
+        root_shell.root_password = root_password
+    return root_shell
+
+
+def get_sftp(ssh_session: paramiko.SSHClient) -> paramiko.SFTPClient:
+    """
+    Возвращает SFTP-сессию подключения (одну на подключение, открывается заново, если прежняя закрыта).
+    """
+    with ssh_pool_lock:
+        sftp = getattr(ssh_session, 'sftp', None)
+        if sftp is None or sftp.sock.closed:
+            sftp = ssh_session.open_sftp()
+            ssh_session.sftp = sftp
+    return sftp
+
+
+def read_remote_file(
+    ssh_session: paramiko.SSHClient,
+    file_path: str = config.get('linux', {}).get('config_file_path', '/opt/xello/external.yml'),
+    root_password: str = config.get('linux', {}).get('root_password', 'xello_root'),
+    use_root_shell: bool = USE_ROOT_SHELL,
+    missing: str | None = ""
+) -> str | None:
+    """
+    Читает файл по SFTP и возвращает его содержимое, либо missing (по умолчанию пустую строку), если файла нет.
+    Если у пользователя нет прав на чтение, файл читается привилегированной командой (см. read_file_if_exists).
+    """
+    try:
+        with get_sftp(ssh_session).open(file_path, 'rb') as file:
+            return file.read().decode()
+    except FileNotFoundError:
+        return missing
+    except PermissionError:
+        return read_file_if_exists(ssh_session, file_path, root_password, use_root_shell, missing)
+
+
+def delete_remote_file(
+    ssh_session: paramiko.SSHClient,
+    file_path: str = config.get('linux', {}).get('config_file_path', '/opt/xello/external.yml'),
+    root_password: str = config.get('linux', {}).get('root_password', 'xello_root'),
+    use_root_shell: bool = USE_ROOT_SHELL
+) -> bool:
+    """
+    Удаляет файл привилегированной командой. Возвращает True, если файла больше нет.
+    """
+    result = run_privileged(ssh_session, f"bash -c 'rm -f {file_path} && [ ! -e {file_path} ]'", root_password, use_root_shell)
+    return result.exit_code == 0
+
+
+def write_remote_file(
+    ssh_session: paramiko.SSHClient,
+    content: str,
+    file_path: str = config.get('linux', {}).get('config_file_path', '/opt/xello/external.yml'),
+    root_password: str = config.get('linux', {}).get('root_password', 'xello_root'),
+    use_root_shell: bool = USE_ROOT_SHELL
+) -> bool:
+    """
+    Записывает файл атомарно: содержимое загружается по SFTP во временный файл в каталоге исходного файла, после чего
+    одной привилегированной командой временному файлу назначаются владелец и права исходного файла, он переименовывается
+    на место исходного (mv -f в пределах одной файловой системы), и вычисляется его SHA-256.
+    Если у пользователя нет прав на запись в каталог, файл загружается в /tmp и копируется во временный файл каталога
+    той же привилегированной командой.
+    Возвращает True, если хэш записанного файла совпал с хэшем отправленного содержимого.
+    """
+    data = content.encode()
+    temp_name = f'.{posixpath.basename(file_path)}.{uuid.uuid4().hex}'
+    staged_path = posixpath.join(posixpath.dirname(file_path) or '.', temp_name)
+    sftp = get_sftp(ssh_session)
+
+    try:
+        sftp.putfo(io.BytesIO(data), staged_path)
+        upload_path = staged_path
+    except PermissionError:
+        upload_path = f'/tmp/{temp_name}'
+        sftp.putfo(io.BytesIO(data), upload_path)
+
+    copy_part = '' if upload_path == staged_path else f"cp -f {upload_path} {staged_path} && rm -f {upload_path} && "
+    move_command = (
+        f"bash -c '{copy_part}{{ [ ! -e {file_path} ] || {{ chown --reference={file_path} {staged_path} && "
+        f"chmod --reference={file_path} {staged_path}; }}; }} && "
+        f"mv -f {staged_path} {file_path} && sha256sum {file_path} || "
+        f"{{ rm -f {upload_path} {staged_path}; exit 1; }}'"
+    )
+    result = run_privileged(ssh_session, move_command, root_password, use_root_shell)
+
+    if result.exit_code != 0:
+        raise Exception(f"Failed to write file: {result.stderr.strip()}")
+
+    output = result.stdout.split()
+    return bool(output) and output[0] == hashlib.sha256(data).hexdigest()
 
 
 def check_config(
@@ -106,7 +500,8 @@ def check_config(
     expected_config: dict,
     file_path: str = config.get('linux', {}).get('config_file_path', '/opt/xello/external.yml'),
     root_password: str = config.get('linux', {}).get('root_password', 'xello_root'),
-    expect_absence: bool = False
+    expect_absence: bool = False,
+    use_root_shell: bool = USE_ROOT_SHELL
 ) -> bool:
     """
     Проверяет наличие или отсутствие всех ключей из expected_config в конфигурационном файле.
@@ -114,7 +509,7 @@ def check_config(
     Если expect_absence == False, проверяет, что все ключи присутствуют с правильными значениями.
     Возвращает True, если условие выполнено, иначе — False.
     """
-    file_content = read_file_if_exists(ssh_session, file_path, root_password)
+    file_content = read_remote_file(ssh_session, file_path, root_password, use_root_shell)
     config_data = yaml.safe_load(file_content) if file_content else {}
     if expect_absence:
         return not base.any_keys_exist(config_data, expected_config)
@@ -126,67 +521,80 @@ def update_config(
     ssh_session: paramiko.SSHClient,
     new_config: dict,
     file_path: str = config.get('linux', {}).get('config_file_path', '/opt/xello/external.yml'),
-    root_password: str = config.get('linux', {}).get('root_password', 'xello_root')
+    root_password: str = config.get('linux', {}).get('root_password', 'xello_root'),
+    use_root_shell: bool = USE_ROOT_SHELL
 ) -> bool:
     """
     Обновляет конфигурационный файл, добавляя или изменяя параметры на основе new_config.
-    Возвращает True, если все ключи и значения удалось обновить, иначе — False.
+    Файл читается и записывается по SFTP (см. write_remote_file), запись проверяется по хэшу содержимого.
+    Возвращает True, если файл записан без искажений, иначе — False.
     """
-    file_content = read_file_if_exists(ssh_session, file_path, root_password)
+    file_content = read_remote_file(ssh_session, file_path, root_password, use_root_shell)
     config_data = yaml.safe_load(file_content) if file_content else {}
     base.deep_update(config_data, new_config)
-    updated_yaml = yaml.dump(config_data)
-
-    write_command = f"sudo bash -c 'cat <<EOF > {file_path}\n{updated_yaml}\nEOF'"
-    _, stdout, stderr = execute_with_privileges(ssh_session, write_command, root_password)
 
-    error = stderr.read().decode().replace("Password:", "").replace("Пароль:", "").strip()
-    if error:
-        raise Exception(f"Failed to write file: {error}")
-
-    return check_config(ssh_session, new_config, file_path, root_password)
+    return write_remote_file(ssh_session, yaml.dump(config_data), file_path, root_password, use_root_shell)
 
 
 def delete_config(
     ssh_session: paramiko.SSHClient,
     keys_to_delete: list[str],
     file_path: str = config.get('linux', {}).get('config_file_path', '/opt/xello/external.yml'),
-    root_password: str = config.get('linux', {}).get('root_password', 'xello_root')
+    root_password: str = config.get('linux', {}).get('root_password', 'xello_root'),
+    use_root_shell: bool = USE_ROOT_SHELL
 ) -> bool:
     """
     Удаляет из конфигурационного файла ключи, указанные в keys_to_delete.
-    Возвращает True, если все указанные ключи были удалены, иначе — False.
+    Файл читается и записывается по SFTP (см. write_remote_file), запись проверяется по хэшу содержимого.
+    Возвращает True, если файл записан без искажений, иначе — False.
     """
-    file_content = read_file_if_exists(ssh_session, file_path, root_password)
+    file_content = read_remote_file(ssh_session, file_path, root_password, use_root_shell)
     config_data = yaml.safe_load(file_content) if file_content else {}
 
     for key_path in keys_to_delete:
         base.delete_key(config_data, key_path)
 
-    updated_yaml = yaml.dump(config_data)
-    if str(updated_yaml).strip() == '{}':
-        write_command = f'sudo truncate -s 0 "{file_path}"'
-    else:
-        write_command = f"sudo bash -c 'cat <<EOF > {file_path}\n{updated_yaml}\nEOF'"
-    _, stdout, stderr = execute_with_privileges(ssh_session, write_command, root_password)
+    updated_yaml = '' if not config_data else yaml.dump(config_data)
+    return write_remote_file(ssh_session, updated_yaml, file_path, root_password, use_root_shell)
 
-    error = stderr.read().decode().replace("Password:", "").replace("Пароль:", "").strip()
-    if error:
-        raise Exception(f"Failed to write file: {error}")
 
-    return check_config(ssh_session, {k: None for k in keys_to_delete}, file_path, root_password, expect_absence=True)
+def config_transaction(
+    ssh_session: paramiko.SSHClient,
+    file_path: str = config.get('linux', {}).get('config_file_path', '/opt/xello/external.yml'),
+    root_password: str = config.get('linux', {}).get('root_password', 'xello_root'),
+    use_root_shell: bool = USE_ROOT_SHELL
+) -> base.ConfigTransaction:
+    """
+    Возвращает транзакцию над конфигурационным файлом (см. base.ConfigTransaction): снимок и запись выполняются по SFTP,
+    если файла не было, при восстановлении он удаляется.
+    Пример:
+        with config_transaction(ssh) as transaction:
+            transaction.update({'auth': {'attempts_count': 3}}).delete('defender')
+            transaction.commit()
+            ...
+    """
+    return base.ConfigTransaction(
+        read=lambda: read_remote_file(ssh_session, file_path, root_password, use_root_shell, missing=None),
+        write=lambda content: write_remote_file(ssh_session, content, file_path, root_password, use_root_shell),
+        remove=lambda: delete_remote_file(ssh_session, file_path, root_password, use_root_shell)
+    )
 
 
 def get_service_status(
     ssh_session: paramiko.SSHClient,
-    service_name: str
+    service_name: str,
+    root_password: str = config.get('linux', {}).get('root_password', 'xello_root'),
+    use_root_shell: bool = USE_ROOT_SHELL
 ):
     """
     Возвращает строку статуса указанной службы с сервера.
     """
     command = f"systemctl status {service_name}"
-    stdin, stdout, stderr = ssh_session.exec_command(command)
-    output = stdout.read().decode('utf-8')
+    if use_root_shell:
+        output = get_root_shell(ssh_session, root_password).run(command).stdout
+    else:
+        stdin, stdout, stderr = ssh_session.exec_command(command)
+        output = stdout.read().decode('utf-8')
 
     status_line = re.search(r'Active: .+', output)
     if status_line:
@@ -195,53 +603,148 @@ def get_service_status(
         return f"Service '{service_name}' not found."
 
 
+# Свойства systemd-юнита, по которым отслеживается состояние службы
+SERVICE_STATE_PROPERTIES = ('LoadState', 'ActiveState', 'SubState', 'ActiveEnterTimestampMonotonic', 'MainPID')
+
+
+@dataclass
+class ServiceState:
+    load_state: str = ''
+    active_state: str = ''
+    sub_state: str = ''
+    active_enter_timestamp: int = 0
+    main_pid: int = 0
+
+    @property
+    def exists(self) -> bool:
+        return self.load_state not in ('', 'not-found')
+
+    @property
+    def is_running(self) -> bool:
+        return self.active_state == 'active' and self.sub_state == 'running'
+
+
+@dataclass
+class ServiceWaitResult:
+    matched: bool
+    state: ServiceState
+    elapsed: float = 0.0
+    polls_count: int = 0
+
+    def __bool__(self):
+        return self.matched
+
+
+def get_service_state(
+    ssh_session: paramiko.SSHClient,
+    service_name: str,
+    root_password: str = config.get('linux', {}).get('root_password', 'xello_root'),
+    use_root_shell: bool = USE_ROOT_SHELL
+) -> ServiceState:
+    """
+    Возвращает состояние службы по данным systemctl show (одна удалённая команда).
+    """
+    command = f"systemctl show {' '.join(f'-p {name}' for name in SERVICE_STATE_PROPERTIES)} {service_name}"
+    if use_root_shell:
+        output = get_root_shell(ssh_session, root_password).run(command).stdout
+    else:
+        stdin, stdout, stderr = ssh_session.exec_command(command)
+        output = stdout.read().decode('utf-8')
+
+    properties = dict(line.split('=', 1) for line in output.splitlines() if '=' in line)
+    timestamp = properties.get('ActiveEnterTimestampMonotonic', '0')
+    main_pid = properties.get('MainPID', '0')
+    return ServiceState(
+        load_state=properties.get('LoadState', ''),
+        active_state=properties.get('ActiveState', ''),
+        sub_state=properties.get('SubState', ''),
+        active_enter_timestamp=int(timestamp) if timestamp.isdigit() else 0,
+        main_pid=int(main_pid) if main_pid.isdigit() else 0
+    )
+
+
+def wait_for_service_state(
+    ssh_session: paramiko.SSHClient,
+    service_name: str,
+    condition: Callable[[ServiceState], bool],
+    timeout: float = 60,
+    initial_delay: float = 0.1,
+    max_delay: float = 1.0,
+    backoff_factor: float = 1.5,
+    failure_states: tuple = ('failed',),
+    root_password: str = config.get('linux', {}).get('root_password', 'xello_root'),
+    use_root_shell: bool = USE_ROOT_SHELL
+) -> ServiceWaitResult:
+    """
+    Опрашивает состояние службы (см. get_service_state), пока condition не вернёт True или не истечёт timeout.\n
+    Пауза между опросами растёт от initial_delay до max_delay, поэтому быстрый переход обнаруживается сразу,
+    а долгий не нагружает сервер. Если ActiveState службы входит в failure_states, ожидание прекращается досрочно.\n
+    Возвращает ServiceWaitResult: признак успеха, последнее состояние, время перехода в секундах и число опросов.
+    """
+    start_time = time.time()
+    delay = initial_delay
+    polls_count = 0
+
+    while True:
+        state = get_service_state(ssh_session, service_name, root_password, use_root_shell)
+        polls_count += 1
+        elapsed = time.time() - start_time
+
+        if condition(state):
+            return ServiceWaitResult(True, state, elapsed, polls_count)
+        if state.active_state in failure_states or elapsed + delay > timeout:
+            return ServiceWaitResult(False, state, elapsed, polls_count)
+
+        time.sleep(delay)
+        delay = min(delay * backoff_factor, max_delay)
+
+
 def set_service_status(
     ssh_session: paramiko.SSHClient,
     service_name: str,
     action: Literal['start', 'stop', 'restart'] = 'restart',
-    timeout: int = 5,
+    timeout: int = 60,
     root_password: str = config.get('linux', {}).get('root_password', 'xello_root'),
-    close_connection: bool = True
+    use_root_shell: bool = USE_ROOT_SHELL
 ):
     """
-    Производит над выбранным сервисом указанное действие. Возвращает строку, если такой службы нет,
-    True в случае успеха или исключение при ошибке.
+    Производит над выбранным сервисом указанное действие и ожидает целевого состояния не дольше timeout секунд
+    (см. wait_for_service_state). Перезапуск считается успешным, если служба снова запущена и изменилось время её
+    активации или PID основного процесса. Возвращает строку, если такой службы нет,
+    True в случае успеха или исключение при ошибке. Подключение не закрывается (оно может быть общим из пула).
     """
-    def execution_part():
-        stdin, stdout, stderr = execute_with_privileges(ssh_session, command, root_password)
-        error = stderr.read().decode('utf-8').replace("Password:", "").replace("Пароль:", "").strip()
+    def execution_part(condition, failure_states=('failed',)):
+        error = run_privileged(ssh_session, command, root_password, use_root_shell).stderr.strip()
         if error:
             raise RuntimeError(error)
-        time.sleep(timeout)
-        return get_service_status(ssh_session, service_name)
+        return wait_for_service_state(
+            ssh_session, service_name, condition, timeout, failure_states=failure_states,
+            root_password=root_password, use_root_shell=use_root_shell
+        )
 
     valid_actions = ['start', 'stop', 'restart']
     if action not in valid_actions:
         raise ValueError(f"Invalid action '{action}'. Valid actions are {valid_actions}.")
 
-    status_output = get_service_status(ssh_session, service_name)
-    if 'not found' in status_output:
+    state_before = get_service_state(ssh_session, service_name, root_password, use_root_shell)
+    if not state_before.exists:
         return f"Service '{service_name}' not found."
 
-    is_active = 'Active: active (running)' in status_output
-
     try:
         command = f"systemctl {action} {service_name}"
 
         if action == 'start':
-            if is_active:
+            if state_before.is_running:
                 return True
             else:
-                status_output = execution_part()
-                if "Active: active (running)" in status_output:
+                if execution_part(lambda state: state.is_running):
                     return True
                 else:
                     raise RuntimeError(f"Failed to start service '{service_name}'.")
 
         elif action == 'stop':
-            if is_active:
-                status_output = execution_part()
-                if "Active: inactive (dead)" in status_output:
+            if state_before.is_running:
+                if execution_part(lambda state: state.active_state == 'inactive', failure_states=()):
                     return True
                 else:
                     raise RuntimeError(f"Failed to stop service '{service_name}'.")
@@ -249,8 +752,13 @@ def set_service_status(
                 return True
 
         elif action == 'restart':
-            status_output_after_su = execution_part()
-            if "Active: active (running)" in status_output_after_su and status_output.split("since")[1].split(";")[0].strip() != status_output_after_su.split("since")[1].split(";")[0].strip():
+            def restarted(state: ServiceState) -> bool:
+                return state.is_running and (
+                    state.active_enter_timestamp != state_before.active_enter_timestamp
+                    or state.main_pid != state_before.main_pid
+                )
+
+            if execution_part(restarted):
                 return True
             else:
                 raise RuntimeError(f"Failed to restart service '{service_name}'.")
@@ -258,8 +766,105 @@ def set_service_status(
     except Exception as e:
         raise RuntimeError(f"Exception occurred: {str(e)}")
 
-    if close_connection:
-        ssh_session.close()
+
+def operation_succeeded(result: object) -> bool:
+    """
+    Признак успеха по умолчанию для run_on_fleet: результат True (update_config, delete_config, check_config,
+    set_service_status) или ServiceWaitResult с совпавшим состоянием (set_service_status с ожиданием).
+    Остальные значения, в том числе строки с сообщениями об ошибке, считаются неудачей.
+    """
+    return result is True or isinstance(result, ServiceWaitResult) and result.matched
+
+
+@dataclass
+class HostResult:
+    host: str
+    result: object = None
+    error: Exception | None = None
+    elapsed: float = 0.0
+    wave: int = 0
+    skipped: bool = False
+    succeeded: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return not self.skipped and self.error is None and self.succeeded
+
+
+def run_on_host(
+    host: str,
+    operation: Callable,
+    args: tuple,
+    kwargs: dict,
+    wave: int,
+    username: str,
+    password: str,
+    port: int,
+    success: Callable[[object], bool] = operation_succeeded
+) -> HostResult:
+    start_time = time.time()
+    try:
+        ssh_session = get_ssh_connection(host, username, password, port)
+        result = HostResult(host, operation(ssh_session, *args, **kwargs), wave=wave)
+        result.succeeded = bool(success(result.result))
+    except Exception as ex:
+        result = HostResult(host, error=ex, wave=wave)
+    result.elapsed = time.time() - start_time
+    return result
+
+
+def run_on_fleet(
+    hosts: list[str],
+    operation: Callable,
+    *args,
+    max_workers: int = 8,
+    wave_size: int = None,
+    halt_on_failure: bool = False,
+    success: Callable[[object], bool] = operation_succeeded,
+    username: str = config.get('linux', {}).get('username', 'xello'),
+    password: str = config.get('linux', {}).get('password', 'xello_root'),
+    port: int = 22,
+    **kwargs
+) -> dict[str, HostResult]:
+    """
+    Выполняет operation(ssh_session, *args, **kwargs) (например, update_config, delete_config, check_config
+    или set_service_status) на нескольких серверах одновременно, не более max_workers подключений за раз.
+    Подключения берутся из пула (см. get_ssh_connection).\n
+    Если задан wave_size, серверы обрабатываются волнами по wave_size штук: следующая волна начинается после
+    завершения предыдущей. Если halt_on_failure == True, после волны с ошибкой остальные серверы пропускаются.\n
+    Ошибкой считается исключение или результат, для которого success(result) ложно (по умолчанию
+    см. operation_succeeded). Для операций с другим результатом, например get_service_status, нужно передать success.
+    Повторяющиеся серверы в hosts не допускаются.\n
+    Возвращает словарь сервер -> HostResult (результат, исключение, время выполнения в секундах, номер волны).
+    Пример:
+        run_on_fleet(['172.16.5.120', '172.16.5.121'], set_service_status, 'slave', 'restart', wave_size=1)
+        run_on_fleet(hosts, get_service_status, 'slave', success=lambda status: 'running' in status)
+    """
+    duplicates = sorted({host for host in hosts if hosts.count(host) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate hosts: {', '.join(duplicates)}")
+
+    wave_size = wave_size or len(hosts) or 1
+    waves = [hosts[i:i + wave_size] for i in range(0, len(hosts), wave_size)]
+    results = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for wave, wave_hosts in enumerate(waves):
+            futures = [
+                executor.submit(run_on_host, host, operation, args, kwargs, wave, username, password, port, success)
+                for host in wave_hosts
+            ]
+            for future in futures:
+                result = future.result()
+                results[result.host] = result
+
+            if halt_on_failure and not all(results[host].ok for host in wave_hosts):
+                for skipped_wave, skipped_hosts in enumerate(waves[wave + 1:], wave + 1):
+                    for host in skipped_hosts:
+                        results[host] = HostResult(host, wave=skipped_wave, skipped=True)
+                break
+
+    return results
 
 
 # new_config = {
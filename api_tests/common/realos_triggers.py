@@ -1,12 +1,18 @@
+import asyncio
 import base64
+import functools
 import os
 import platform
 import re
+import select
+import struct
 import httpx
 import socket
 import subprocess
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 import mysql.connector
 import yaml
 from mysql.connector import Error
@@ -30,18 +36,22 @@ paramiko.Transport._preferred_kex = ['diffie-hellman-group-exchange-sha256', 'di
 paramiko.Transport._preferred_ciphers = ['aes128-ctr', 'aes192-ctr', 'aes256-ctr']
 paramiko.Transport._preferred_macs = ['hmac-sha2-256', 'hmac-sha1']
 
+# Файл known_hosts общий для всех SSH/SFTP-триггеров, поэтому при параллельном запуске доступ к нему сериализуется
+known_hosts_lock = threading.Lock()
+
 
 def clear_known_hosts(trap_server: str, known_hosts_file: str):
     """Удаляет все записи с данным хостом из файла known_hosts."""
-    new_host_keys = []
-    if os.path.exists(known_hosts_file):
-        with open(known_hosts_file, 'r') as f:
-            for line in f:
-                if trap_server not in line:
-                    new_host_keys.append(line)
+    with known_hosts_lock:
+        new_host_keys = []
+        if os.path.exists(known_hosts_file):
+            with open(known_hosts_file, 'r') as f:
+                for line in f:
+                    if trap_server not in line:
+                        new_host_keys.append(line)
 
-    with open(known_hosts_file, 'w') as f:
-        f.writelines(new_host_keys)
+        with open(known_hosts_file, 'w') as f:
+            f.writelines(new_host_keys)
 
 
 def db_trigger(
@@ -49,7 +59,8 @@ def db_trigger(
     port: int = 3306,
     database: str = 'default',
     username: str = 'root',
-    password: str = 'qwerty'
+    password: str = 'qwerty',
+    timeout: int = 10
 ) -> bool:
     connection = None
 
@@ -59,7 +70,8 @@ def db_trigger(
             port=port,
             database=database,
             user=username,
-            password=password
+            password=password,
+            connection_timeout=timeout
         )
 
         if connection.is_connected():
@@ -80,9 +92,10 @@ def ftp_trigger(
     trap_server: str,
     username: str = 'root',
     password: str = 'qwerty',
-    port: int = 21
+    port: int = 21,
+    timeout: int = 10
 ) -> bool:
-    ftp = FTP()
+    ftp = FTP(timeout=timeout)
 
     try:
         ftp.connect(trap_server, port)
@@ -133,7 +146,7 @@ def sftp_trigger(
 
         host_key = client.get_transport().get_remote_server_key()
 
-        with open(known_hosts_file, 'a') as f:
+        with known_hosts_lock, open(known_hosts_file, 'a') as f:
             f.write(f"{trap_server} {host_key.get_name()} {host_key.get_base64()}\n")
 
         sftp = client.open_sftp()
@@ -168,7 +181,7 @@ def ssh_trigger(
         client.connect(trap_server, port=port, username=username, password=password, timeout=timeout)
 
         host_key = client.get_transport().get_remote_server_key()
-        with open(known_hosts_file, 'a') as f:
+        with known_hosts_lock, open(known_hosts_file, 'a') as f:
             f.write(f"{trap_server} {host_key.get_name()} {host_key.get_base64()}\n")
 
         if client.get_transport() is None or not client.get_transport().is_active():
@@ -181,34 +194,231 @@ def ssh_trigger(
         client.close()
 
 
-def icmp_trigger(trap_server: str) -> bool:
+@dataclass
+class IcmpStats:
+    trap_server: str
+    sent: int = 0
+    received: int = 0
+    rtts: list[float] = field(default_factory=list)
+
+    @property
+    def loss(self) -> float:
+        return 1 - self.received / self.sent if self.sent else 1.0
+
+    @property
+    def min_rtt(self) -> float | None:
+        return min(self.rtts) if self.rtts else None
+
+    @property
+    def avg_rtt(self) -> float | None:
+        return sum(self.rtts) / len(self.rtts) if self.rtts else None
+
+    @property
+    def max_rtt(self) -> float | None:
+        return max(self.rtts) if self.rtts else None
+
+
+def icmp_checksum(data: bytes) -> int:
+    if len(data) % 2:
+        data += b'\x00'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xffff)
+    total += total >> 16
+    return ~total & 0xffff
+
+
+def open_icmp_socket() -> tuple[socket.socket, bool]:
+    """
+    Открывает непривилегированный ICMP-сокет (SOCK_DGRAM), а если он недоступен - raw-сокет.
+    Возвращает сокет и признак того, что сокет raw. Если недоступны оба варианта, пробрасывает OSError.
     """
-    Делает попытку отправки 4 пакетов на указанный сервер.
+    try:
+        return socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP), False
+    except OSError:
+        return socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP), True
+
+
+def icmp_sweep(
+    trap_servers: list[str],
+    count: int = 4,
+    interval: float = 0.2,
+    payload_size: int = 56,
+    timeout: float = 1
+) -> dict[str, IcmpStats]:
+    """
+    Отправляет count ICMP echo-запросов с интервалом interval секунд одновременно на все серверы trap_servers
+    через один сокет без запуска утилиты ping. Ответы ожидаются не дольше timeout секунд после последней отправки.\n
+    Возвращает словарь {сервер: IcmpStats} с количеством отправленных и полученных пакетов и RTT в секундах.
+    """
+    stats = {trap_server: IcmpStats(trap_server) for trap_server in trap_servers}
+    stats_by_address = {}
+    for trap_server in trap_servers:
+        stats_by_address.setdefault(socket.gethostbyname(trap_server), []).append(stats[trap_server])
+
+    identifier = os.getpid() & 0xffff
+    payload = bytes(i & 0xff for i in range(payload_size))
+    sent_at = {}
+
+    sock, is_raw = open_icmp_socket()
+
+    def receive_until(deadline: float):
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return
+            ready, _, _ = select.select([sock], [], [], remaining)
+            if not ready:
+                return
+            received_at = time.perf_counter()
+            try:
+                packet, (address, _) = sock.recvfrom(65535)
+            except BlockingIOError:
+                continue
+
+            # Raw-сокеты (и DGRAM-сокеты в macOS) возвращают пакет вместе с IP-заголовком
+            if packet and packet[0] >> 4 == 4:
+                packet = packet[(packet[0] & 0x0f) * 4:]
+            if len(packet) < 8:
+                continue
+
+            icmp_type, _, _, reply_identifier, sequence = struct.unpack('!BBHHH', packet[:8])
+            # Для DGRAM-сокетов идентификатор подменяет ядро, поэтому он проверяется только для raw-сокетов
+            if icmp_type != 0 or (is_raw and reply_identifier != identifier):
+                continue
+
+            started_at = sent_at.pop((address, sequence), None)
+            if started_at is not None:
+                for host_stats in stats_by_address.get(address, []):
+                    host_stats.received += 1
+                    host_stats.rtts.append(received_at - started_at)
+
+    with sock:
+        sock.setblocking(False)
+        for sequence in range(count):
+            send_time = time.perf_counter()
+            for address, host_stats in stats_by_address.items():
+                header = struct.pack('!BBHHH', 8, 0, 0, identifier, sequence)
+                checksum = icmp_checksum(header + payload)
+                packet = struct.pack('!BBHHH', 8, 0, checksum, identifier, sequence) + payload
+                try:
+                    sock.sendto(packet, (address, 0))
+                except OSError:
+                    continue
+                sent_at[(address, sequence)] = time.perf_counter()
+                for item in host_stats:
+                    item.sent += 1
+
+            if sequence < count - 1:
+                receive_until(send_time + interval)
+        receive_until(time.perf_counter() + timeout)
+
+    return stats
+
+
+def icmp_trigger(
+    trap_server: str,
+    count: int = 4,
+    interval: float = 0.2,
+    payload_size: int = 56,
+    timeout: float = 1
+) -> bool:
+    """
+    Делает попытку отправки count ICMP-пакетов на указанный сервер.
     Так как ханипот на все соединения отвечает 'Request timed out.', невозможно точно знать, удачна ли попытка получения инцидента,
-    поэтому метод всегда возвращает True.
+    поэтому метод возвращает True, если хотя бы один пакет был отправлен.
+    Если ICMP-сокеты недоступны (например, в Windows без прав администратора), используется утилита ping.
     Инцидент может приходить с задержкой до 60 секунд.
     """
-    output = 'NUL 2>&1' if platform.system().lower() == 'windows' else '/dev/null 2>&1'
-    os.system(f'ping {trap_server} > {output}')
-    return True
+    try:
+        stats = icmp_sweep([trap_server], count, interval, payload_size, timeout)
+    except PermissionError:
+        output = 'NUL 2>&1' if platform.system().lower() == 'windows' else '/dev/null 2>&1'
+        os.system(f'ping {trap_server} > {output}')
+        return True
+
+    return stats[trap_server].sent > 0
+
+
+# Порты, проверяемые сканированием по умолчанию (scan_ports_async, scan_ports, scan_trigger)
+DEFAULT_SCAN_PORTS = (21, 22, 79, 81, 88, 106, 3306, 5800, 5900, 8080, 8081, 8888, 9100, 9999, 80, 443)
+
+
+@dataclass
+class PortProbe:
+    trap_server: str
+    port: int
+    attempt: int
+    state: str  # open, refused, timeout или error
+    duration: float
+    error: str | None = None
+
+
+async def scan_ports_async(
+    trap_servers: list[str],
+    ports: tuple[int, ...] = DEFAULT_SCAN_PORTS,
+    attempts: int = 3,
+    timeout: float = 1,
+    max_in_flight: int = 256
+) -> list[PortProbe]:
+    """
+    Неблокирующе открывает TCP-соединения на все порты ports всех серверов trap_servers (attempts попыток на порт).
+    Одновременно выполняется не более max_in_flight подключений, каждое ограничено timeout секундами.\n
+    Возвращает список PortProbe с результатом каждой попытки: open (порт ответил), refused (соединение сброшено),
+    timeout (ответа нет) или error (прочие сетевые ошибки).
+    """
+    loop = asyncio.get_running_loop()
+    window = asyncio.Semaphore(max_in_flight)
+
+    async def probe(trap_server: str, port: int, attempt: int) -> PortProbe:
+        async with window:
+            start_time = time.perf_counter()
+            state, error = 'open', None
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+                s.setblocking(False)
+                try:
+                    await asyncio.wait_for(loop.sock_connect(s, (trap_server, port)), timeout)
+                except asyncio.TimeoutError:
+                    state = 'timeout'
+                except ConnectionRefusedError:
+                    state = 'refused'
+                except OSError as ex:
+                    state, error = 'error', str(ex)
+            return PortProbe(trap_server, port, attempt, state, time.perf_counter() - start_time, error)
+
+    return list(await asyncio.gather(*(
+        probe(trap_server, port, attempt)
+        for trap_server in trap_servers for port in ports for attempt in range(1, attempts + 1)
+    )))
+
+
+def scan_ports(
+    trap_servers: list[str],
+    ports: tuple[int, ...] = DEFAULT_SCAN_PORTS,
+    attempts: int = 3,
+    timeout: float = 1,
+    max_in_flight: int = 256
+) -> list[PortProbe]:
+    """
+    Синхронная обёртка над scan_ports_async. При достаточном max_in_flight сканирование любого количества
+    ловушек укладывается примерно в одно окно timeout.
+    """
+    return asyncio.run(scan_ports_async(trap_servers, ports, attempts, timeout, max_in_flight))
 
 
 def scan_trigger(
     trap_server: str,
-    ports: list = (21, 22, 79, 81, 88, 106, 3306, 5800, 5900, 8080, 8081, 8888, 9100, 9999, 80, 443),
-    attempts: int = 3
+    ports: tuple[int, ...] = DEFAULT_SCAN_PORTS,
+    attempts: int = 3,
+    timeout: float = 1
 ) -> bool:
     """
     По умолчанию делает 3 запроса доступности на каждый указанный порт сервера.
     Однократной отправки зачатую бывает мало для получения инцидента.
+    Все подключения выполняются одновременно, поэтому сканирование занимает около timeout секунд.
     Всегда возвращает True, кроме случая, когда при попытке отправки возникает исключение.
     Инцидент может приходить с задержкой до 60 секунд.
     """
-    for port in ports:
-        for attempt in range(attempts):
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.settimeout(1)
-                s.connect_ex((trap_server, port))
+    scan_ports([trap_server], ports, attempts, timeout)
     return True
 
 
@@ -251,7 +461,8 @@ def smb_and_win_trigger(
     username: str = 'guest',
     password: str = 'qwerty',
     open_folder: str = None,
-    port: int = 445
+    port: int = 445,
+    timeout: int = 10
 ) -> bool:
     """
     Триггер WIN срабатывает только если попытку авторизоваться предпринимает пользователь guest.\n
@@ -263,11 +474,11 @@ def smb_and_win_trigger(
     rand_conn = None
     try:
         conn = SMBConnection(username, password, "client_name", trap_server, use_ntlm_v2=True, is_direct_tcp=True)
-        conn.connect(trap_server, port)
+        conn.connect(trap_server, port, timeout=timeout)
 
         if open_folder:
             rand_conn = SMBConnection("random", "random_password", "client_name", trap_server, use_ntlm_v2=True, is_direct_tcp=True)
-            rand_conn.connect(trap_server, port)
+            rand_conn.connect(trap_server, port, timeout=timeout)
             rand_conn.listPath(service_name=open_folder, path='/')
 
         conn.close()
@@ -285,7 +496,8 @@ def web_trigger(
     trap_server: str,
     username: str = 'root',
     password: str = 'qwerty',
-    resource: str = ''
+    resource: str = '',
+    timeout: int = 10
 ) -> bool:
     """
     Создаёт 2 WEB-события: в первом можно указать кастомный ресурс через resource, а во втором креды авторизации.\n
@@ -293,7 +505,7 @@ def web_trigger(
     """
     try:
         url = f"https://{trap_server}/{resource.lstrip('/')}"
-        response = httpx.get(url, verify=False)
+        response = httpx.get(url, verify=False, timeout=timeout)
 
         match = re.search(r'var turl\s*=\s*[\"\']([^\"\']+)[\"\']', response.text)
         if match:
@@ -305,7 +517,7 @@ def web_trigger(
 
         new_url = f"https://{trap_server}{login_endpoint}"
         auth_header = f"Basic {base64.b64encode(f'{username}:{password}'.encode()).decode()}"
-        new_response = httpx.get(new_url, headers={"Authorization": auth_header}, verify=False)
+        new_response = httpx.get(new_url, headers={"Authorization": auth_header}, verify=False, timeout=timeout)
 
         return new_response.status_code == 401
 
@@ -355,12 +567,140 @@ def smb_folders_check(
         return False
 
 
+TRIGGERS = {
+    'db': db_trigger,
+    'ftp': ftp_trigger,
+    'sftp': sftp_trigger,
+    'ssh': ssh_trigger,
+    'icmp': icmp_trigger,
+    'scan': scan_trigger,
+    'rpc': rpc_trigger,
+    'winrm': winrm_trigger,
+    'rdp': rdp_trigger,
+    'smb': smb_and_win_trigger,
+    'web': web_trigger,
+}
+
+# Максимальное количество одновременных запусков триггера каждого протокола (по всем ловушкам)
+TRIGGER_CONCURRENCY = {
+    'sftp': 8,
+    'ssh': 8,
+    'smb': 8,
+    'rdp': 1,
+}
+DEFAULT_TRIGGER_CONCURRENCY = 16
+
+# Триггеры, принимающие timeout подключения (см. connect_timeout в run_triggers_async)
+CONNECT_TIMEOUT_PROTOCOLS = ('db', 'ftp', 'sftp', 'ssh', 'smb', 'web')
+
+
+@dataclass
+class TriggerResult:
+    trap_server: str
+    protocol: str
+    success: bool = False
+    error: str | None = None
+    duration: float = 0.0
+    timed_out: bool = False
+
+
+async def run_triggers_async(
+    trap_servers: list[str],
+    protocols: list[str] = None,
+    params: dict = None,
+    concurrency: dict = None,
+    timeout: float = 60,
+    connect_timeout: float = None
+) -> list[TriggerResult]:
+    """
+    Параллельно запускает триггеры протоколов protocols (ключи TRIGGERS) на всех ловушках trap_servers.
+    По умолчанию запускаются все триггеры, кроме RDP (работает только с Windows).\n
+    params - дополнительные аргументы триггеров по протоколу (например, {'web': {'resource': '/admin'}}).
+    concurrency - ограничения одновременных запусков по протоколу, дополняют TRIGGER_CONCURRENCY.
+    timeout - время выполнения одного триггера в секундах, после которого он помечается timed_out.
+    connect_timeout - таймаут подключения, передаваемый триггерам CONNECT_TIMEOUT_PROTOCOLS (если не задан в params).\n
+    Блокирующие триггеры выполняются в пуле потоков, асинхронные - напрямую в цикле событий. Асинхронный триггер
+    по истечении timeout отменяется и завершается с ошибкой. Поток триггера прервать нельзя, поэтому его ожидание
+    продолжается до завершения (время ограничивает connect_timeout), слот протокола остаётся занятым,
+    а в результат записываются фактические исход и длительность с признаком timed_out.
+    Возвращает список TriggerResult для каждой пары (ловушка, протокол) в порядке перебора.
+    """
+    protocols = list(protocols or [protocol for protocol in TRIGGERS if protocol != 'rdp'])
+    unknown_protocols = [protocol for protocol in protocols if protocol not in TRIGGERS]
+    if unknown_protocols:
+        raise ValueError(f"Unknown protocols {unknown_protocols}. Valid protocols are {list(TRIGGERS)}.")
+
+    params = params or {}
+    limits = {**TRIGGER_CONCURRENCY, **(concurrency or {})}
+    semaphores = {protocol: asyncio.Semaphore(limits.get(protocol, DEFAULT_TRIGGER_CONCURRENCY)) for protocol in protocols}
+    max_workers = sum(min(limits.get(protocol, DEFAULT_TRIGGER_CONCURRENCY), len(trap_servers)) for protocol in protocols)
+
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=max(max_workers, 1), thread_name_prefix='trigger')
+
+    async def run_trigger(trap_server: str, protocol: str) -> TriggerResult:
+        result = TriggerResult(trap_server, protocol)
+        trigger = TRIGGERS[protocol]
+        kwargs = params.get(protocol, {})
+        if connect_timeout is not None and protocol in CONNECT_TIMEOUT_PROTOCOLS:
+            kwargs = {'timeout': connect_timeout, **kwargs}
+
+        async with semaphores[protocol]:
+            start_time = time.perf_counter()
+            if asyncio.iscoroutinefunction(trigger):
+                call = asyncio.ensure_future(trigger(trap_server, **kwargs))
+            else:
+                call = loop.run_in_executor(executor, functools.partial(trigger, trap_server, **kwargs))
+
+            _, pending = await asyncio.wait([call], timeout=timeout)
+            # Слот протокола освобождается только после фактического завершения триггера
+            if pending:
+                result.timed_out = True
+                if asyncio.iscoroutinefunction(trigger):
+                    call.cancel()
+                await asyncio.wait([call])
+            result.duration = time.perf_counter() - start_time
+
+            if call.cancelled():
+                result.error = f'Timeout reached: cancelled after {timeout} seconds.'
+            elif call.exception() is not None:
+                result.error = f'{type(call.exception()).__name__}: {call.exception()}'
+            else:
+                result.success = bool(call.result())
+
+        return result
+
+    try:
+        return list(await asyncio.gather(*(
+            run_trigger(trap_server, protocol) for trap_server in trap_servers for protocol in protocols
+        )))
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def run_triggers(
+    trap_servers: list[str],
+    protocols: list[str] = None,
+    params: dict = None,
+    concurrency: dict = None,
+    timeout: float = 60,
+    connect_timeout: float = None
+) -> list[TriggerResult]:
+    """
+    Синхронная обёртка над run_triggers_async для вызова из тестов.
+    Полный прогон занимает примерно столько же, сколько самый медленный из триггеров.
+    """
+    return asyncio.run(run_triggers_async(trap_servers, protocols, params, concurrency, timeout, connect_timeout))
+
+
 # print(db_trigger('172.16.5.121'))
 # print(ftp_trigger('172.16.5.121'))
 # print(sftp_trigger('172.16.5.121'))
 # print(ssh_trigger('172.16.5.121'))
 # print(icmp_trigger('172.16.5.121'))
+# print(icmp_sweep(['172.16.5.121', '172.16.5.122'], count=2))
 # print(scan_trigger('172.16.5.121'))
+# print(scan_ports(['172.16.5.121', '172.16.5.122'], [135, 445, 5985]))
 # print(rpc_trigger('172.16.5.121'))
 # print(winrm_trigger('172.16.5.121'))
 # print(rdp_trigger('172.16.5.121'))
@@ -370,37 +710,5 @@ def smb_folders_check(
 # print(smb_folders_check('172.16.5.121', ['passports']))
 
 
-
-# from concurrent.futures import ThreadPoolExecutor
-# from itertools import cycle
-#
-# methods_with_params = [
-#     (db_trigger, {'trap_server': '172.16.5.121'}),
-#     (ftp_trigger, {'trap_server': '172.16.5.121'}),
-#     (sftp_trigger, {'trap_server': '172.16.5.121'}),
-#     (ssh_trigger, {'trap_server': '172.16.5.121'}),
-#     (icmp_trigger, {'trap_server': '172.16.5.121'}),
-#     (scan_trigger, {'trap_server': '172.16.5.121'}),
-#     (rpc_trigger, {'trap_server': '172.16.5.121'}),
-#     (winrm_trigger, {'trap_server': '172.16.5.121'}),
-#     (smb_and_win_trigger, {'trap_server': '172.16.5.121'}),
-#     (web_trigger, {'trap_server': '172.16.5.121'})
-#     (rdp_trigger, {'trap_server': '172.16.5.90'})
-# ]
-#
-#
-# def run_infinite_methods(max_threads=10):
-#     with ThreadPoolExecutor(max_workers=max_threads) as executor:
-#         method_cycle = cycle(methods_with_params)
-#
-#         while True:
-#             method, params = next(method_cycle)
-#             future = executor.submit(lambda m=method, p=params: m(**p))
-#             future.add_done_callback(
-#                 lambda f, m=method: print(f"{m.__name__} finished with result: {f.result()}")
-#             )
-#
-#             time.sleep(0.01)
-#
-#
-# run_infinite_methods()
+# for result in run_triggers(['172.16.5.121', '172.16.5.122'], ['db', 'ftp', 'ssh', 'scan', 'web']):
+#     print(result)
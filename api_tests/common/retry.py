@@ -0,0 +1,196 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+import httpx
+from api_tests.common.shared_cache import SharedCache
+
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Автоматический выключатель по хосту, общий для всех xdist-воркеров текущего запуска (состояние хранится
+    в SharedCache под идентификатором запуска run_id, по умолчанию PYTEST_XDIST_TESTRUNUID или PID процесса).\n
+    Когда один из воркеров исчерпал срок повторов (или, если задан failure_threshold, после стольких неудачных попыток
+    подряд суммарно по всем воркерам), хост считается недоступным на reset_timeout секунд,
+    и все воркеры сразу получают CircuitOpenError. После этого пропускается одна пробная попытка: при успехе
+    выключатель сбрасывается, при неудаче хост снова считается недоступным на reset_timeout секунд.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = None,
+        reset_timeout: float = 5 * 60,
+        cache: SharedCache = None,
+        run_id: str = None
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.cache = cache or SharedCache('circuit_breaker')
+        self.run_id = run_id or os.environ.get('PYTEST_XDIST_TESTRUNUID') or str(os.getpid())
+
+    def key(self, host: str) -> str:
+        return f'{self.run_id}|{host}'
+
+    def get_state(self, entries: dict, host: str) -> dict:
+        """
+        Возвращает состояние хоста из записей кэша и удаляет устаревшие записи (в том числе прошлых запусков).
+        """
+        now = time.time()
+        for key in [key for key, entry in entries.items() if entry.get('expires_at') is not None and entry['expires_at'] <= now]:
+            del entries[key]
+        return entries.get(self.key(host), {}).get('value', {})
+
+    def set_state(self, entries: dict, host: str, state: dict):
+        entries[self.key(host)] = {'value': state, 'expires_at': time.time() + 2 * self.reset_timeout}
+
+    def is_open(self, host: str) -> bool:
+        state = self.cache.get(self.key(host)) or {}
+        return state.get('open_until', 0) > time.time()
+
+    def check(self, host: str):
+        """
+        Пропускает вызов, если хост не отмечен недоступным. После истечения reset_timeout пропускает одну пробную
+        попытку (остальные вызовы получают CircuitOpenError, пока она не завершится или не пройдёт reset_timeout).
+        """
+        now = time.time()
+        with self.cache.transaction() as entries:
+            state = self.get_state(entries, host)
+            if not state.get('open_until'):
+                return
+            if state['open_until'] <= now and state.get('trial_until', 0) <= now:
+                self.set_state(entries, host, {**state, 'trial_until': now + self.reset_timeout})
+                return
+        raise CircuitOpenError(f'Host "{host}" is marked as unavailable, retry after {self.reset_timeout} seconds.')
+
+    def record_failure(self, host: str):
+        now = time.time()
+        with self.cache.transaction() as entries:
+            state = self.get_state(entries, host)
+            failures = state.get('failures', 0) + 1
+            open_until = state.get('open_until', 0)
+            if state.get('trial_until') or (self.failure_threshold and failures >= self.failure_threshold):
+                open_until = now + self.reset_timeout
+            self.set_state(entries, host, {'failures': failures, 'open_until': open_until})
+
+    def record_success(self, host: str):
+        with self.cache.transaction() as entries:
+            self.get_state(entries, host)
+            entries.pop(self.key(host), None)
+
+    def trip(self, host: str):
+        with self.cache.transaction() as entries:
+            state = self.get_state(entries, host)
+            self.set_state(entries, host, {'failures': state.get('failures', 0), 'open_until': time.time() + self.reset_timeout})
+
+
+class RetryPolicy:
+    """
+    Политика повторных попыток: экспоненциальная пауза от initial_delay до max_delay со случайным отклонением jitter,
+    общий срок deadline и классификация ошибок. Повторяются только сетевые ошибки, некорректный JSON и HTTP-статусы
+    из retry_statuses, остальные ошибки пробрасываются сразу.
+    Если передан breaker, то при недоступности хоста (в том числе по решению другого воркера) попытки прекращаются сразу.
+    """
+
+    def __init__(
+        self,
+        initial_delay: float = 1,
+        max_delay: float = 15,
+        backoff_factor: float = 2,
+        jitter: float = 0.2,
+        deadline: float = 3 * 60,
+        retry_on: tuple = (httpx.TransportError, json.JSONDecodeError),
+        retry_statuses: tuple = (408, 429, 500, 502, 503, 504),
+        breaker: CircuitBreaker = None
+    ):
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.backoff_factor = backoff_factor
+        self.jitter = jitter
+        self.deadline = deadline
+        self.retry_on = retry_on
+        self.retry_statuses = retry_statuses
+        self.breaker = breaker
+
+    def is_retryable(self, ex: Exception) -> bool:
+        if isinstance(ex, httpx.HTTPStatusError):
+            return ex.response.status_code in self.retry_statuses
+        return isinstance(ex, self.retry_on)
+
+    def next_delay(self, attempt: int) -> float:
+        delay = min(self.initial_delay * self.backoff_factor ** attempt, self.max_delay)
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def handle_failure(self, ex: Exception, host: str, start_time: float, attempt: int) -> float:
+        """
+        Обрабатывает неудачную попытку и возвращает паузу до следующей, либо пробрасывает исключение.
+        """
+        if not self.is_retryable(ex):
+            raise ex
+
+        delay = self.next_delay(attempt)
+        if self.breaker and host:
+            self.breaker.record_failure(host)
+            if time.time() - start_time + delay > self.deadline:
+                self.breaker.trip(host)
+            if self.breaker.is_open(host):
+                raise CircuitOpenError(f'Host "{host}" is unavailable: {ex}') from ex
+
+        if time.time() - start_time + delay > self.deadline:
+            raise Exception(f'Timeout reached: the server is unavailable for {self.deadline / 60} minutes.') from ex
+
+        logger.warning('Error: %s. Retry after %.1f seconds...', ex, delay)
+        return delay
+
+    def call(self, func, *args, host: str = None, **kwargs):
+        """
+        Вызывает func(*args, **kwargs) с повторными попытками согласно политике.
+        """
+        if self.breaker and host:
+            self.breaker.check(host)
+
+        start_time = time.time()
+        attempt = 0
+        while True:
+            try:
+                result = func(*args, **kwargs)
+            except Exception as ex:
+                time.sleep(self.handle_failure(ex, host, start_time, attempt))
+                attempt += 1
+                continue
+
+            if self.breaker and host:
+                self.breaker.record_success(host)
+            return result
+
+    async def call_async(self, func, *args, host: str = None, **kwargs):
+        """
+        Асинхронный аналог call для корутинных функций.
+        """
+        if self.breaker and host:
+            self.breaker.check(host)
+
+        start_time = time.time()
+        attempt = 0
+        while True:
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as ex:
+                await asyncio.sleep(self.handle_failure(ex, host, start_time, attempt))
+                attempt += 1
+                continue
+
+            if self.breaker and host:
+                self.breaker.record_success(host)
+            return result
+
+
+default_retry_policy = RetryPolicy(breaker=CircuitBreaker())
@@ -0,0 +1,115 @@
+import getpass
+import json
+import os
+import stat
+import tempfile
+import time
+from contextlib import contextmanager
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+
+def get_cache_dir() -> str:
+    """
+    Возвращает каталог общих для всех xdist-воркеров файлов кэша (токены, ключи API), отдельный для каждого
+    пользователя. Каталог создаётся с правами 0700. Если он принадлежит другому пользователю или это не каталог,
+    пробрасывается исключение, так как его содержимое могло быть подменено.
+    """
+    path = os.environ.get('AUTO_TESTS_CACHE_DIR')
+    if not path:
+        user_id = os.getuid() if hasattr(os, 'getuid') else getpass.getuser()
+        path = os.path.join(tempfile.gettempdir(), f'auto_tests_cache_{user_id}')
+
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    if os.name != 'nt':
+        path_stat = os.lstat(path)
+        if not stat.S_ISDIR(path_stat.st_mode) or path_stat.st_uid != os.getuid():
+            raise RuntimeError(f'Cache directory "{path}" is not a directory owned by the current user.')
+        if stat.S_IMODE(path_stat.st_mode) != 0o700:
+            os.chmod(path, 0o700)
+    return path
+
+
+CACHE_DIR = get_cache_dir()
+
+
+@contextmanager
+def file_lock(path: str):
+    """
+    Эксклюзивная межпроцессная блокировка на время выполнения блока (отдельный файл path + '.lock').
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.lock', 'a+') as lock_file:
+        if os.name == 'nt':
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == 'nt':
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class SharedCache:
+    """
+    Кэш «ключ - значение» в JSON-файле, общий для всех xdist-воркеров (и последовательных запусков).
+    Каждая запись может иметь время истечения. Чтение и запись выполняются под файловой блокировкой.
+    """
+
+    def __init__(self, name: str, cache_dir: str = CACHE_DIR):
+        self.path = os.path.join(cache_dir, f'{name}.json')
+
+    def read(self) -> dict:
+        try:
+            with open(self.path, 'r') as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def write(self, entries: dict):
+        temp_path = f'{self.path}.{os.getpid()}.tmp'
+        with os.fdopen(os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w') as file:
+            json.dump(entries, file)
+        os.replace(temp_path, self.path)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Блокирует кэш на время выполнения блока и отдаёт словарь записей. Изменения словаря сохраняются при выходе.
+        """
+        with file_lock(self.path):
+            entries = self.read()
+            snapshot = json.dumps(entries, sort_keys=True)
+            yield entries
+            if json.dumps(entries, sort_keys=True) != snapshot:
+                self.write(entries)
+
+    def get(self, key: str):
+        """
+        Возвращает значение по ключу, либо None, если записи нет или срок её действия истёк.
+        """
+        with file_lock(self.path):
+            entry = self.read().get(key)
+        if entry is None or (entry.get('expires_at') is not None and entry['expires_at'] <= time.time()):
+            return None
+        return entry.get('value')
+
+    def set(self, key: str, value, expires_at: float = None):
+        with self.transaction() as entries:
+            entries[key] = {'value': value, 'expires_at': expires_at}
+
+    def delete(self, key: str, value=None):
+        """
+        Удаляет запись. Если передан value, запись удаляется только если она всё ещё содержит это значение.
+        """
+        with self.transaction() as entries:
+            if key in entries and (value is None or entries[key].get('value') == value):
+                del entries[key]
@@ -1,15 +1,38 @@
+import atexit
+import base64
+import codecs
+import hashlib
+import json
 import re
 import sys
+import threading
+import time
+import uuid
+from pathlib import Path
 from typing import Literal
 import yaml
 import winrm
+from winrm.exceptions import WinRMOperationTimeoutError
 from api_tests.common import base
-from jinja2 import Environment, FileSystemLoader
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+
+# Шаблоны сценариев PowerShell ищутся относительно модуля, а не текущего каталога. Каждый шаблон компилируется
+# один раз за процесс, скомпилированный байт-код кэшируется на диске для остальных xdist-воркеров и запусков.
+# Каталог кэша выбирает Jinja2: он создаётся для текущего пользователя с правами 0700 и проверкой владельца,
+# так как байт-код из общего каталога выполнялся бы без проверки.
+TEMPLATES_DIR = Path(__file__).parent / 'templates'
+
+template_env = Environment(
+    loader=FileSystemLoader(TEMPLATES_DIR),
+    bytecode_cache=FileSystemBytecodeCache(),
+    auto_reload=False,
+    cache_size=-1
+)
 
 
 def render_template(template_name, context):
-    env = Environment(loader=FileSystemLoader('templates'))  # Возможно нужно будет изменить на "api_tests/common/templates"
-    template = env.get_template(template_name)
+    template = template_env.get_template(template_name)
     return template.render(context)
 
 
@@ -42,6 +65,314 @@ def get_winrm_connection(
         sys.exit(1)
 
 
+# Обёртка одного сценария для постоянного процесса PowerShell (см. PowerShellSession). Сценарий передаётся в base64,
+# выполняется как временный .ps1 (поэтому exit завершает только сценарий), а stdout, ошибки и код завершения
+# возвращаются одной строкой: JSON в base64 между маркерами.
+PS_SESSION_WRAPPER = (
+    "$__script = [Text.Encoding]::UTF8.GetString([Convert]::FromBase64String('__SCRIPT__')); "
+    "$__path = Join-Path $env:TEMP ('ps_session_' + [Guid]::NewGuid().ToString('N') + '.ps1'); "
+    "[IO.File]::WriteAllText($__path, $__script, (New-Object Text.UTF8Encoding $true)); "
+    "$__out = ''; $__err = ''; $__code = 0; "
+    "try { $global:LASTEXITCODE = 0; $__records = & $__path 2>&1; $__success = $?; "
+    "$__out = ($__records | Where-Object { $_ -isnot [Management.Automation.ErrorRecord] } | Out-String); "
+    "$__err = ($__records | Where-Object { $_ -is [Management.Automation.ErrorRecord] } | Out-String); "
+    "if ($LASTEXITCODE) { $__code = $LASTEXITCODE } elseif (-not $__success) { $__code = 1 } } "
+    "catch { $__err += ($_ | Out-String); $__code = 1 } "
+    "finally { Remove-Item -LiteralPath $__path -Force -ErrorAction SilentlyContinue }; "
+    "$__json = @{ out = [string]$__out; err = [string]$__err; code = [int]$__code } | ConvertTo-Json -Compress; "
+    "[Console]::Out.WriteLine('__MARKER__' + [Convert]::ToBase64String([Text.Encoding]::UTF8.GetBytes($__json)) "
+    "+ '__MARKER__'); [Console]::Out.Flush()"
+)
+
+# Наибольшая длина строки, отправляемой процессу PowerShell за один вызов. WinRM передаёт stdin в base64 внутри
+# SOAP-сообщения, размер которого ограничен параметром сервера MaxEnvelopeSizekb (500 КБ по умолчанию).
+PS_SESSION_MAX_INPUT = 256 * 1024
+
+
+class PowerShellSession:
+    """
+    Постоянный процесс PowerShell на сервере в одной оболочке WinRM. Сценарии выполняются в нём по очереди,
+    без создания новой оболочки на каждый вызов (как в winrm.Session.run_ps).\n
+    run_ps возвращает winrm.Response с разделёнными stdout, stderr и кодом завершения, поэтому сессию можно передавать
+    во все функции модуля вместо winrm.Session. Если процесс PowerShell завершился или оболочка недоступна,
+    при следующем вызове она открывается заново.
+    """
+
+    def __init__(
+        self,
+        winrm_session: winrm.Session,
+        timeout: float = 120
+    ):
+        self.winrm_session = winrm_session
+        self.protocol = winrm_session.protocol
+        self.timeout = timeout
+        self.shell_id = None
+        self.command_id = None
+        self.stdout_buffer = b''
+        self.stderr_buffer = b''
+        self.lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self.shell_id is not None and self.command_id is not None
+
+    def open(self):
+        self.close()
+        self.shell_id = self.protocol.open_shell(codepage=65001)
+        self.command_id = self.protocol.run_command(
+            self.shell_id,
+            'powershell',
+            ['-NoProfile', '-NonInteractive', '-ExecutionPolicy', 'Bypass', '-Command', '-']
+        )
+
+    def close(self):
+        if self.shell_id is not None:
+            try:
+                if self.command_id is not None:
+                    self.protocol.cleanup_command(self.shell_id, self.command_id)
+                self.protocol.close_shell(self.shell_id)
+            except Exception:
+                pass
+        self.shell_id = None
+        self.command_id = None
+        self.stdout_buffer = b''
+        self.stderr_buffer = b''
+
+    def send(self, script: str) -> str:
+        """
+        Отправляет сценарий процессу PowerShell и возвращает его маркер. Если отправить не удалось,
+        оболочка открывается заново и отправка повторяется один раз (сценарий при этом ещё не выполнялся).
+        Если сценарий после кодирования длиннее PS_SESSION_MAX_INPUT, пробрасывается ValueError.
+        """
+        marker = f'__PS_SESSION_{uuid.uuid4().hex}__'
+        encoded_script = base64.b64encode(script.encode('utf-8')).decode('ascii')
+        line = PS_SESSION_WRAPPER.replace('__SCRIPT__', encoded_script).replace('__MARKER__', marker) + '\r\n'
+        if len(line) > PS_SESSION_MAX_INPUT:
+            raise ValueError(
+                f'PowerShell script is too large: {len(line)} characters after encoding, '
+                f'the limit is {PS_SESSION_MAX_INPUT}. Split the data into several calls.'
+            )
+
+        if not self.is_open:
+            self.open()
+        try:
+            self.protocol.send_command_input(self.shell_id, self.command_id, line)
+        except Exception:
+            self.open()
+            self.protocol.send_command_input(self.shell_id, self.command_id, line)
+        return marker
+
+    def collect(self, marker: str, deadline: float) -> winrm.Response:
+        """
+        Читает вывод процесса до строки с маркером и возвращает результат сценария.
+        Вывод, попавший в stdout процесса в обход конвейера (например, Write-Host), добавляется в начало stdout.
+        """
+        pattern = re.compile(re.escape(marker).encode() + rb'([A-Za-z0-9+/=]*)' + re.escape(marker).encode() + rb'\r?\n?')
+
+        while True:
+            match = pattern.search(self.stdout_buffer)
+            if match:
+                break
+            if time.time() > deadline:
+                raise TimeoutError('PowerShell session script timed out.')
+            try:
+                stdout, stderr, _, command_done = self.protocol.get_command_output_raw(self.shell_id, self.command_id)
+            except WinRMOperationTimeoutError:
+                continue
+            self.stdout_buffer += stdout
+            self.stderr_buffer += stderr
+            if command_done and not pattern.search(self.stdout_buffer):
+                raise ConnectionError(f'PowerShell process has exited: {self.stderr_buffer.decode(errors="replace")}')
+
+        envelope = json.loads(base64.b64decode(match.group(1)).decode('utf-8'))
+        std_out = self.stdout_buffer[:match.start()] + envelope['out'].encode('utf-8')
+        std_err = self.stderr_buffer + envelope['err'].encode('utf-8')
+        self.stdout_buffer = self.stdout_buffer[match.end():]
+        self.stderr_buffer = b''
+        return winrm.Response((std_out, std_err.strip(), envelope['code']))
+
+    def run_ps(self, script: str, timeout: float = None) -> winrm.Response:
+        with self.lock:
+            try:
+                marker = self.send(script)
+                return self.collect(marker, time.time() + (timeout or self.timeout))
+            except Exception:
+                self.close()
+                raise
+
+    def run_cmd(self, command: str, args=()) -> winrm.Response:
+        return self.winrm_session.run_cmd(command, args)
+
+
+# Постоянные сессии PowerShell текущего процесса: (сервер, порт, пользователь) -> сессия
+ps_sessions: dict[tuple, PowerShellSession] = {}
+ps_sessions_lock = threading.Lock()
+
+
+def get_ps_session(
+    server: str,
+    username: str = config.get('win', {}).get('username', 'Administrator'),
+    password: str = config.get('win', {}).get('password', 'Logaribe2*'),
+    port: int = 5985
+) -> PowerShellSession:
+    """
+    Возвращает постоянную сессию PowerShell (см. PowerShellSession) для сервера, одну на процесс.
+    Её можно передавать во все функции модуля вместо сессии WinRM:
+        ps_session = get_ps_session('172.16.5.119')
+        set_reg_prop(ps_session, 'test', 'String', 'value', 'Xello')
+        check_reg_prop(ps_session, 'test', 'String', 'value', 'Xello')
+    """
+    key = (server, port, username)
+    with ps_sessions_lock:
+        ps_session = ps_sessions.get(key)
+        if ps_session is None:
+            ps_session = PowerShellSession(get_winrm_connection(server, username, password, port))
+            ps_sessions[key] = ps_session
+    return ps_session
+
+
+def close_ps_sessions():
+    """
+    Закрывает все постоянные сессии PowerShell.
+    """
+    with ps_sessions_lock:
+        for ps_session in ps_sessions.values():
+            ps_session.close()
+        ps_sessions.clear()
+
+
+def run_ps_stdin(
+    winrm_session: winrm.Session | PowerShellSession,
+    script: str
+) -> winrm.Response:
+    """
+    Выполняет сценарий, передавая его процессу PowerShell через stdin, поэтому его размер не ограничен длиной
+    командной строки (8191 символ у cmd.exe), как в winrm.Session.run_ps. Постоянная сессия (см. get_ps_session)
+    используется как есть, для сессии WinRM открывается отдельная оболочка, которая закрывается после сценария.
+    """
+    if isinstance(winrm_session, PowerShellSession):
+        return winrm_session.run_ps(script)
+
+    ps_session = PowerShellSession(winrm_session)
+    try:
+        return ps_session.run_ps(script)
+    finally:
+        ps_session.close()
+
+
+atexit.register(close_ps_sessions)
+
+
+def dump_config(config_data: dict) -> str:
+    """
+    Преобразует конфигурацию в YAML в формате, ожидаемом службой (числа и логические значения без кавычек).
+    """
+    updated_yaml = yaml.dump(config_data, default_flow_style=False, allow_unicode=True)
+    return re.sub(r'\'(\d+|true|false)\'', r'\1', updated_yaml)
+
+
+def run_json_script(
+    winrm_session: winrm.Session,
+    template_name: str,
+    context: dict
+) -> dict:
+    """
+    Выполняет сценарий из шаблона, который выводит результат последней строкой в формате JSON, и возвращает его.
+    Сценарий передаётся через stdin (см. run_ps_stdin), так как данные встраиваются в него целиком.
+    Если сценарий вернул объект с ошибкой (поле error), пробрасывает исключение.
+    """
+    response = run_ps_stdin(winrm_session, render_template(template_name, context))
+    output = response.std_out.decode('utf-8', errors='replace').strip().splitlines()
+    try:
+        result = json.loads(output[-1])
+    except (IndexError, ValueError):
+        raise Exception(f"Unexpected output of '{template_name}': {response.std_out} {response.std_err}")
+
+    if isinstance(result, dict) and result.get('error'):
+        raise Exception(result['error'])
+    return result
+
+
+def decode_config(data: bytes, codepage: int) -> str:
+    """
+    Декодирует содержимое конфигурационного файла: UTF-16 с BOM, UTF-8 (с BOM или без), иначе кодовая страница ANSI.
+    """
+    if data.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return data.decode('utf-16')
+    try:
+        return data.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        return data.decode(f'cp{codepage}')
+
+
+def read_config_file(
+    winrm_session: winrm.Session,
+    file_path: str = config.get('win', {}).get('config_file_path', 'C:/Program Files (x86)/Xello/SlaveServer/external.yml'),
+    with_hash: bool = False,
+    missing: str | None = ""
+) -> str | None | tuple[str | None, str | None]:
+    """
+    Возвращает содержимое конфигурационного файла, либо missing (по умолчанию пустую строку), если файла нет.
+    Выполняется за один вызов. Если with_hash == True, возвращает кортеж (содержимое, SHA-256 файла),
+    хэш равен None, если файла нет.\n
+    Файл читается как UTF-8 (или UTF-16 при наличии BOM), если это не UTF-8, - в системной кодировке ANSI сервера
+    (например, после Set-Content в Windows PowerShell).
+    """
+    result = run_json_script(winrm_session, 'read_config.j2', {'file_path': file_path})
+    content = decode_config(base64.b64decode(result['content']), result['codepage']) if result['exists'] else missing
+    file_hash = result['hash'] if result['exists'] else None
+    return (content, file_hash) if with_hash else content
+
+
+def write_config_file(
+    winrm_session: winrm.Session,
+    content: str,
+    file_path: str = config.get('win', {}).get('config_file_path', 'C:/Program Files (x86)/Xello/SlaveServer/external.yml'),
+    expected_hash: str = None
+) -> bool:
+    """
+    Записывает содержимое в конфигурационный файл (UTF-8 без BOM) за один вызов. Если содержимое файла уже совпадает
+    с записываемым, запись не выполняется. Если передан expected_hash, файл записывается, только если его текущий
+    SHA-256 равен expected_hash (пустая строка - файла не должно быть), иначе пробрасывается исключение.
+    Возвращает True, если SHA-256 файла после записи совпал с хэшем отправленного содержимого.
+    """
+    data = content.encode('utf-8')
+    context = {
+        'file_path': file_path,
+        'content': base64.b64encode(data).decode('ascii'),
+        'expected_hash': expected_hash
+    }
+    result = run_json_script(winrm_session, 'write_config.j2', context)
+    return result['hash'] == hashlib.sha256(data).hexdigest()
+
+
+def remove_config_file(
+    winrm_session: winrm.Session,
+    file_path: str = config.get('win', {}).get('config_file_path', 'C:/Program Files (x86)/Xello/SlaveServer/external.yml')
+) -> bool:
+    """
+    Удаляет конфигурационный файл за один вызов. Возвращает True, если файла больше нет.
+    """
+    result = run_json_script(winrm_session, 'remove_config.j2', {'file_path': file_path})
+    return not result['exists']
+
+
+def config_transaction(
+    winrm_session: winrm.Session,
+    file_path: str = config.get('win', {}).get('config_file_path', 'C:/Program Files (x86)/Xello/SlaveServer/external.yml')
+) -> base.ConfigTransaction:
+    """
+    Возвращает транзакцию над конфигурационным файлом (см. base.ConfigTransaction).
+    Если файла не было, при восстановлении он удаляется.
+    """
+    return base.ConfigTransaction(
+        read=lambda: read_config_file(winrm_session, file_path, missing=None),
+        write=lambda content: write_config_file(winrm_session, content, file_path),
+        remove=lambda: remove_config_file(winrm_session, file_path),
+        dump=dump_config
+    )
+
+
 def check_config(
     winrm_session: winrm.Session,
     expected_config: dict,
@@ -54,19 +385,10 @@ def check_config(
     Если expect_absence == False, проверяет, что все ключи присутствуют с правильными значениями.
     Возвращает True, если условие выполнено, иначе — False.
     """
-    check_command = f'Test-Path "{file_path}"'
-    response = winrm_session.run_ps(check_command)
-    file_exists = str(response.std_out.strip().lower()) in ["true", "b'true'"]
-
-    if file_exists:
-        command = f'type "{file_path}"'
-        response = winrm_session.run_ps(command)
-        if response.status_code != 0:
-            raise Exception(f"Failed to read file: {response.std_err.decode()}")
-    else:
+    file_content, file_hash = read_config_file(winrm_session, file_path, with_hash=True)
+    if file_hash is None:
         return False
 
-    file_content = response.std_out.decode()
     config_data = yaml.safe_load(file_content) if file_content else {}
 
     if expect_absence:
@@ -82,33 +404,14 @@ def update_config(
 ) -> bool:
     """
     Обновляет конфигурационный файл, добавляя или изменяя параметры на основе new_config.
-    Возвращает True, если все ключи и значения удалось обновить, иначе — False.
-    """
-    check_command = f'Test-Path "{file_path}"'
-    response = winrm_session.run_ps(check_command)
-    file_exists = str(response.std_out.strip().lower()) in ["true", "b'true'"]
-
-    if file_exists:
-        command = f'type "{file_path}"'
-        response = winrm_session.run_ps(command)
-        if response.status_code != 0:
-            raise Exception(f"Failed to read file: {response.std_err.decode()}")
-        file_content = response.std_out.decode()
-    else:
-        file_content = ""
-
+    Выполняется за два вызова: чтение и запись при условии, что файл не изменился с момента чтения.
+    Возвращает True, если файл записан без искажений (по SHA-256), иначе — False.
+    """
+    file_content, file_hash = read_config_file(winrm_session, file_path, with_hash=True)
     config_data = yaml.safe_load(file_content) if file_content else {}
     base.deep_update(config_data, new_config)
 
-    updated_yaml = yaml.dump(config_data, default_flow_style=False)
-    updated_yaml = re.sub(r'\'(\d+|true|false)\'', r'\1', updated_yaml)
-
-    command = f'Set-Content -Path "{file_path}" -Value @\"\n{updated_yaml}\"@'
-    response = winrm_session.run_ps(command)
-    if response.status_code != 0:
-        raise Exception(f"Failed to write file: {response.std_err.decode()}")
-
-    return check_config(winrm_session, new_config, file_path)
+    return write_config_file(winrm_session, dump_config(config_data), file_path, expected_hash=file_hash or '')
 
 
 def delete_config(
@@ -117,44 +420,21 @@ def delete_config(
     file_path: str = config.get('win', {}).get('config_file_path', 'C:/Program Files (x86)/Xello/SlaveServer/external.yml')
 ) -> bool:
     """
-    Удаляет из конфигурационного файла ключи, указанные в keys_to_delete.
-    Возвращает True, если все указанные ключи были удалены, иначе — False.
+    Удаляет из конфигурационного файла ключи, указанные в keys_to_delete. Если файла нет, создаётся пустой файл.
+    Выполняется за два вызова: чтение и запись при условии, что файл не изменился с момента чтения.
+    Возвращает True, если файл записан без искажений (по SHA-256), иначе — False.
     """
-    check_command = f'Test-Path "{file_path}"'
-    response = winrm_session.run_ps(check_command)
-    file_exists = str(response.std_out.strip().lower()) in ["true", "b'true'"]
-
-    if file_exists:
-        command = f'type "{file_path}"'
-        response = winrm_session.run_ps(command)
-        if response.status_code != 0:
-            raise Exception(f"Failed to read file: {response.std_err.decode()}")
-        file_content = response.std_out.decode()
-    else:
-        create_command = f'New-Item -Path "{file_path}" -ItemType File'
-        response = winrm_session.run_ps(create_command)
-        if response.status_code != 0:
-            raise Exception(f"Failed to create file: {response.std_err.decode()}")
-
-        return True
+    file_content, file_hash = read_config_file(winrm_session, file_path, with_hash=True)
+    if file_hash is None:
+        return write_config_file(winrm_session, "", file_path, expected_hash='')
 
     config_data = yaml.safe_load(file_content) if file_content else {}
 
     for key_path in keys_to_delete:
         base.delete_key(config_data, key_path)
 
-    updated_yaml = yaml.dump(config_data, default_flow_style=False)
-    updated_yaml = re.sub(r'\'(\d+|true|false)\'', r'\1', updated_yaml)
-    if str(updated_yaml).strip() == '{}':
-        command = f'Clear-Content -Path "{file_path}"'
-    else:
-        command = f'Set-Content -Path "{file_path}" -Value @\"\n{updated_yaml}\"@'
-
-    response = winrm_session.run_ps(command)
-    if response.status_code != 0:
-        raise Exception(f"Failed to write file: {response.std_err.decode()}")
-
-    return check_config(winrm_session, {k: None for k in keys_to_delete}, file_path, expect_absence=True)
+    updated_yaml = dump_config(config_data) if config_data else ""
+    return write_config_file(winrm_session, updated_yaml, file_path, expected_hash=file_hash)
 
 
 def set_service_status(
@@ -373,6 +653,84 @@ def delete_reg_prop(
     return str(response.std_out.strip().lower()) in ["true", "b'true'"]
 
 
+def build_reg_manifest(
+    manifest: list[dict],
+    reg_prefix: str = config.get('win', {}).get('registry_prefix', 'HKLM:\\SOFTWARE\\WOW6432Node\\')
+) -> list[dict]:
+    """
+    Приводит записи манифеста к виду, который передаётся в сценарий apply_reg_manifest.j2: полный путь в формате
+    PowerShell, значения Binary - список байтов, MultiString - список строк, DWORD и QWORD - десятичная строка.
+    """
+    entries = []
+    for entry in manifest:
+        prop_type = entry.get('prop_type', 'String')
+        prop_value = entry.get('prop_value')
+
+        if entry.get('delete'):
+            prop_value = None
+        elif prop_type == 'Binary':
+            prop_value = list(bytes(prop_value))
+        elif prop_type == 'MultiString':
+            prop_value = [str(v) for v in prop_value]
+        elif prop_type in ('DWORD', 'QWORD'):
+            prop_value = str(int(prop_value))
+        else:
+            prop_value = str(prop_value)
+
+        entries.append({
+            'full_path': convert_reg_path(reg_prefix + entry.get('reg_suffix', '')),
+            'prop_name': entry['prop_name'],
+            'prop_type': prop_type,
+            'prop_value': prop_value,
+            'delete': bool(entry.get('delete', False))
+        })
+    return entries
+
+
+def apply_reg_manifest(
+    winrm_session: winrm.Session,
+    manifest: list[dict],
+    reg_prefix: str = config.get('win', {}).get('registry_prefix', 'HKLM:\\SOFTWARE\\WOW6432Node\\'),
+    verify_only: bool = False
+) -> list[dict]:
+    """
+    Применяет к реестру Windows весь манифест за один вызов PowerShell и проверяет результат.
+    manifest - список записей с ключами как у set_reg_prop: prop_name, prop_type, prop_value, reg_suffix
+    (prop_type по умолчанию String), либо prop_name, reg_suffix и delete=True для удаления свойства.
+    Значения указываются так же, как для set_reg_prop (Binary - bytes/bytearray, DWORD и QWORD - десятичные числа,
+    MultiString - список строк).
+    Если verify_only == True, реестр не изменяется, выполняется только проверка.
+    Манифест передаётся через stdin процесса PowerShell (см. run_ps_stdin), а не в командной строке,
+    слишком большой манифест (см. PS_SESSION_MAX_INPUT) нужно разбить на части.
+    Возвращает список результатов по записям: full_path, prop_name, prop_type, delete, applied (запись изменила реестр),
+    matched (свойство соответствует манифесту), actual_type (в написании prop_type, например DWORD), actual_value и error.
+    Пример:
+        results = apply_reg_manifest(session, [
+            {'reg_suffix': 'Xello', 'prop_name': 'test1', 'prop_type': 'DWORD', 'prop_value': 25235},
+            {'reg_suffix': 'Xello', 'prop_name': 'test2', 'prop_type': 'Binary', 'prop_value': b'\\x35\\x14'},
+            {'reg_suffix': 'Xello', 'prop_name': 'test3', 'delete': True},
+        ])
+        assert all(result['matched'] for result in results)
+    """
+    entries = build_reg_manifest(manifest, reg_prefix)
+    context = {
+        'manifest': base64.b64encode(json.dumps(entries).encode('utf-8')).decode('ascii'),
+        'verify_only': verify_only
+    }
+    return run_json_script(winrm_session, 'apply_reg_manifest.j2', context)
+
+
+def verify_reg_manifest(
+    winrm_session: winrm.Session,
+    manifest: list[dict],
+    reg_prefix: str = config.get('win', {}).get('registry_prefix', 'HKLM:\\SOFTWARE\\WOW6432Node\\')
+) -> list[dict]:
+    """
+    Проверяет соответствие реестра Windows манифесту за один вызов PowerShell, не изменяя его (см. apply_reg_manifest).
+    """
+    return apply_reg_manifest(winrm_session, manifest, reg_prefix, verify_only=True)
+
+
 # new_config = {
 #     "defender": {
 #         "old_mode": "false",
@@ -1,4 +1,7 @@
+import asyncio
 import allure
+import pytest
+from api_tests.common import base
 
 
 tabs = (
@@ -9,14 +12,49 @@ tabs = (
     'settings-roles', 'settings-license', 'settings-deploy', 'settings-common'
 )
 
+# Пакетный режим: запросы аудита всех выбранных вкладок отправляются одновременно (см. audit_responses)
+AUDIT_BATCH = base.config.get('mgmt', {}).get('audit_batch', False)
+
+
+async def dispatch_audit_requests(tab_names: list[str]) -> dict:
+    session = await base.get_session_async()
+    try:
+        responses = await asyncio.gather(
+            *(session.post('management/settings/audit', json={'tabName': tab}) for tab in tab_names),
+            return_exceptions=True
+        )
+    finally:
+        await session.aclose()
+    return dict(zip(tab_names, responses))
+
+
+@pytest.fixture(scope='module')
+def audit_responses(request):
+    """
+    В пакетном режиме (mgmt.audit_batch в config.yaml) отправляет запросы аудита вкладок, тесты которых выбраны
+    в текущем запуске, одновременно через одну асинхронную сессию. Каждый ответ выдаётся тесту один раз,
+    поэтому при перезапуске упавшего теста запрос отправляется заново.
+    В обычном режиме возвращает пустой словарь, и каждый тест отправляет свой запрос сам.
+    """
+    if not AUDIT_BATCH:
+        return {}
+
+    selected_tests = {item.name for item in request.session.items if item.module is request.module}
+    return asyncio.run(dispatch_audit_requests([tab for tab in tabs if f'test_audit_{tab}' in selected_tests]))
+
+
 for tab in tabs:
     def make_test(tab_name):
         @allure.feature('API Tests')
         @allure.story('Audit')
         @allure.title(f'Audit test for "{tab_name}"')
-        def test_audit(session):
+        def test_audit(session, audit_responses):
             with allure.step(f'Проверка запроса аудита на вкладке "{tab_name}"'):
-                response = session.post('management/settings/audit', json={'tabName': tab_name})
+                response = audit_responses.pop(tab_name, None)
+                if response is None:
+                    response = session.post('management/settings/audit', json={'tabName': tab_name})
+                if isinstance(response, Exception):
+                    raise response
                 assert response.status_code == 200, f"Ожидали 200, получили {response.status_code}"
 
         return test_audit
@@ -7,7 +7,7 @@ from api_tests.common import base
 @allure.title('Login and logout')
 def test_login_logout():
     with allure.step('Авторизация'):
-        session = base.get_session()
+        session = base.get_session(use_token_cache=False, refresh_on_401=False)
 
     with allure.step('Отправка GET запроса с использованием сессии'):
         response = session.get('management/policies')
@@ -21,6 +21,38 @@ def session():
     return base.get_session()
 
 
+@pytest.fixture()
+def external_config():
+    """
+    Фабрика транзакций над конфигурационными файлами серверов (см. base.ConfigTransaction).
+    Принимает функцию создания транзакции (linux.config_transaction или win.config_transaction) и её аргументы.
+    Снимок файла делается при вызове фабрики, исходное содержимое восстанавливается после теста, если оно менялось.
+    Восстанавливаются все файлы, даже если часть восстановлений завершилась ошибкой, ошибки выводятся после.
+    Пример:
+        transaction = external_config(linux.config_transaction, linux.get_ssh_connection('172.16.5.120'))
+        transaction.update({'auth': {'attempts_count': 3}}).delete('defender').commit()
+    """
+    transactions = []
+
+    def factory(make_transaction, *args, **kwargs):
+        transaction = make_transaction(*args, **kwargs).begin()
+        transactions.append(transaction)
+        return transaction
+
+    yield factory
+
+    errors = []
+    for index, transaction in reversed(list(enumerate(transactions))):
+        try:
+            if not transaction.rollback():
+                errors.append(f'#{index}: the restored file was not verified')
+        except Exception as ex:
+            errors.append(f'#{index}: {ex!r}')
+
+    if errors:
+        raise Exception('Failed to restore config files:\n' + '\n'.join(errors))
+
+
 @pytest.fixture(scope='session', params=["chromium", "firefox"])  # chromium firefox webkit
 def browser(request):
     with sync_playwright() as p: